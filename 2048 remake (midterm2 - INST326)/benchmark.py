@@ -0,0 +1,232 @@
+""" Measure how fast the 2048 engine (eleven.py) and the computer players
+(midtern2.py) run.
+
+Every benchmark is seeded, so repeated runs measure the same work. The
+results (operations per second, higher is better) are printed and can be
+written to a JSON file; a later run can be compared against that file to
+find regressions.
+
+Usage:
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.1
+"""
+
+from argparse import ArgumentParser
+from copy import copy
+from functools import partial
+import json
+import platform
+import random
+import sys
+import time
+
+from eleven import Board, DIRECTIONS, DirectionError
+from midtern2 import ComputerPlayer, ComputerPlayer2
+
+
+def sample_boards(width, count, seed):
+    """ Create boards in the middle of random games.
+
+    Args:
+        width (int): the width of the boards.
+        count (int): the number of boards.
+        seed (int): the seed for the random module.
+
+    Returns:
+        list of Board: the boards.
+    """
+    random.seed(seed)
+    boards = []
+    while len(boards) < count:
+        board = Board(width)
+        for i in range(random.randrange(width ** 2 * 2)):
+            moves = board.valid_moves()
+            if not moves or board.is_winner():
+                break
+            board.move(random.choice(moves))
+            if not board.free_spaces():
+                break
+            board.new_number()
+        boards.append(board)
+    return boards
+
+
+def rate(func, items, min_time):
+    """ Call func on every item, over and over, for at least min_time
+    seconds.
+
+    Returns:
+        float: the number of calls per second.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for item in items:
+            func(item)
+        calls += len(items)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+
+
+def bench_calculate_move(board):
+    """ Calculate every move on a board with an empty cache. """
+    for d in DIRECTIONS:
+        board.cache.clear()
+        try:
+            board.calculate_move(d)
+        except DirectionError:
+            pass
+
+
+def bench_move(board):
+    """ Make every valid move on a board, undoing each one. """
+    snapshot = board.snapshot()
+    for d in DIRECTIONS:
+        try:
+            board.move(d)
+        except DirectionError:
+            continue
+        board.restore(snapshot)
+
+
+def bench_new_number(board):
+    """ Add a number to a board, then undo it. """
+    if board.free_spaces():
+        snapshot = board.snapshot()
+        board.new_number()
+        board.restore(snapshot)
+
+
+def bench_valid_moves(board):
+    """ Find the valid moves of a board with an empty cache. """
+    board.cache.clear()
+    board.valid_moves()
+
+
+def bench_games(cls, width, count, seed, min_time):
+    """ Have a player play games until min_time seconds have passed.
+
+    Returns:
+        float: the number of games played per second.
+    """
+    player_class = type(cls.__name__, (cls,),
+                        {"board_class": partial(Board, width=width)})
+    random.seed(seed)
+    games = 0
+    start = time.perf_counter()
+    while True:
+        player_class().play()
+        games += 1
+        elapsed = time.perf_counter() - start
+        if games >= count and elapsed >= min_time:
+            return games / elapsed
+
+
+def run(widths, seed=0, positions=200, min_time=0.5, games=3):
+    """ Run every benchmark for every board width.
+
+    Args:
+        widths (list of int): the board widths.
+        seed (int): the seed for the random module.
+        positions (int): the number of boards to benchmark the engine
+            on.
+        min_time (float): the minimum time to spend on each benchmark,
+            in seconds.
+        games (int): the minimum number of games for each player.
+
+    Returns:
+        dict of str: float: operations per second for each benchmark,
+        keyed by "name[width]".
+    """
+    results = {}
+    engine = [("calculate_move", bench_calculate_move),
+              ("move", bench_move),
+              ("new_number", bench_new_number),
+              ("valid_moves", bench_valid_moves),
+              ("copy", copy)]
+    for width in widths:
+        boards = sample_boards(width, positions, seed)
+        for name, func in engine:
+            random.seed(seed)
+            key = "{}[{}]".format(name, width)
+            results[key] = rate(func, boards, min_time)
+            print("{:<28}{:>14.1f} /s".format(key, results[key]))
+        for cls in [ComputerPlayer, ComputerPlayer2]:
+            key = "games_{}[{}]".format(cls.__name__, width)
+            results[key] = bench_games(cls, width, games, seed, min_time)
+            print("{:<28}{:>14.1f} /s".format(key, results[key]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Compare results with a baseline.
+
+    Args:
+        results (dict of str: float): results of run().
+        baseline (dict of str: float): earlier results of run().
+        threshold (float): the fraction by which a benchmark must slow
+            down to count as a regression.
+
+    Returns:
+        list of str: the names of the benchmarks that regressed.
+    """
+    regressions = []
+    for key in sorted(set(results) & set(baseline)):
+        ratio = results[key] / baseline[key]
+        flag = ""
+        if ratio < 1 - threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("{:<28}{:>8.2f}x{}".format(key, ratio, flag))
+    return regressions
+
+
+def parse_args(arglist):
+    """ Parse command-line arguments. """
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--widths", type=int, nargs="+", default=[3, 4, 6],
+                        help="board widths to benchmark")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the random module")
+    parser.add_argument("--positions", type=int, default=200,
+                        help="number of boards for engine benchmarks")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="minimum seconds per benchmark")
+    parser.add_argument("--games", type=int, default=3,
+                        help="minimum games per player")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare",
+                        help="compare results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown that counts as a regression")
+    return parser.parse_args(arglist)
+
+
+def main(arglist):
+    """ Run the benchmarks, save them, and compare them with a baseline
+    as requested on the command line.
+
+    Returns:
+        int: 1 if any benchmark regressed, otherwise 0.
+    """
+    args = parse_args(arglist)
+    results = run(args.widths, args.seed, args.positions, args.min_time,
+                  args.games)
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "seed": args.seed,
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,571 @@
+""" A bitboard backend for the 4x4 version of the 2048 board in
+eleven.py.
+
+Every tile on the board is a number from 1 to 11, so each cell fits in
+four bits (a "nibble") and the whole 4x4 board fits in a single 64-bit
+integer. Cell (x, y) is stored in bits 4*(4*y+x) through 4*(4*y+x)+3;
+an empty cell is stored as 0. Each row therefore occupies 16 bits,
+which means the result of moving a row to the left (or right) can be
+looked up in a precomputed table with 65,536 entries instead of being
+calculated every time. Moving up or down transposes the board and
+looks its rows up in tables that turn each moved row back into a
+column. Other tables give the cells, the empty cells, and the largest
+number of each row, so that reading a board never loops over its 16
+cells. The tables are built when the module is imported.
+"""
+
+import random
+
+from eleven import Board, DirectionError, DIRECTIONS, PROB_1
+
+
+# masks for the nibbles and rows of a bitboard
+CELL_MASK = 0xF
+ROW_MASK = 0xFFFF
+# the largest value a nibble can hold; tiles of this value never merge
+MAX_NIBBLE = 0xF
+# the lowest bit of every nibble
+LOW_BITS = 0x1111111111111111
+
+
+def _reverse_row(row):
+    """ Reverse the order of the four nibbles in a 16-bit row. """
+    return (((row & 0xF) << 12) | ((row & 0xF0) << 4)
+            | ((row & 0xF00) >> 4) | ((row & 0xF000) >> 12))
+
+
+def _slide_row(row):
+    """ Move a 16-bit row to the left.
+
+    Args:
+        row (int): four nibbles; the lowest nibble is the leftmost cell.
+
+    Returns:
+        tuple of int, int: the new row and the points earned.
+    """
+    values = [(row >> (4 * i)) & CELL_MASK for i in range(4)]
+    values = [v for v in values if v]
+    new_values = []
+    points = 0
+    i = 0
+    while i < len(values):
+        v = values[i]
+        if (i + 1 < len(values) and values[i + 1] == v
+                and v < MAX_NIBBLE):
+            new_values.append(v + 1)
+            points += (v + 1) ** 2
+            i += 2
+        else:
+            new_values.append(v)
+            i += 1
+    new_row = 0
+    for i, v in enumerate(new_values):
+        new_row |= v << (4 * i)
+    return new_row, points
+
+
+def _spread_row(row):
+    """ Turn a 16-bit row into a column: nibble i of the row is moved to
+    nibble 4*i of the result. """
+    return ((row & 0xF) | ((row & 0xF0) << 12) | ((row & 0xF00) << 24)
+            | ((row & 0xF000) << 36))
+
+
+def _build_tables():
+    """ Calculate the lookup tables.
+
+    Returns:
+        tuple of six lists of int: the rows that result from moving
+        each possible row left and right, the same rows spread out into
+        columns (for moving a transposed board up and down), and the
+        points earned by moving each possible row left and right.
+    """
+    size = ROW_MASK + 1
+    left = [0] * size
+    right = [0] * size
+    points_left = [0] * size
+    points_right = [0] * size
+    for row in range(size):
+        left[row], points_left[row] = _slide_row(row)
+    for row in range(size):
+        rev = _reverse_row(row)
+        right[row] = _reverse_row(left[rev])
+        points_right[row] = points_left[rev]
+    up = [_spread_row(row) for row in left]
+    down = [_spread_row(row) for row in right]
+    return left, right, up, down, points_left, points_right
+
+
+(ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN,
+ POINTS_LEFT, POINTS_RIGHT) = _build_tables()
+
+
+def _build_row_tables():
+    """ Calculate the tables used to read rows.
+
+    Returns:
+        tuple of three lists: for each possible row, the contents of its
+        four cells (as in Board.matrix), the positions of its empty
+        cells, and its largest number. Rows with the same empty cells
+        share one tuple, so the second table holds only 16 tuples.
+    """
+    size = ROW_MASK + 1
+    empties = [tuple(i for i in range(4) if not mask & (1 << i))
+               for mask in range(16)]
+    cells = [None] * size
+    empty = [None] * size
+    largest = [0] * size
+    for row in range(size):
+        values = [(row >> (4 * i)) & CELL_MASK for i in range(4)]
+        cells[row] = tuple(v or None for v in values)
+        empty[row] = empties[sum(1 << i for i, v in enumerate(values) if v)]
+        largest[row] = max(values)
+    return cells, empty, largest
+
+
+ROW_CELLS, ROW_EMPTY, ROW_MAX = _build_row_tables()
+
+
+def transpose_state(state):
+    """ Return a version of a bitboard with the rows turned into columns
+    and vice versa. """
+    a1 = state & 0xF0F00F0FF0F00F0F
+    a2 = state & 0x0000F0F00000F0F0
+    a3 = state & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def encode(matrix):
+    """ Convert a 16-item matrix like Board.matrix to a bitboard.
+
+    Args:
+        matrix (list of (int or None)): a 4x4 board.
+
+    Returns:
+        int: the corresponding bitboard.
+
+    Raises:
+        ValueError: matrix is not 4x4 or contains a value that does not
+            fit in a nibble.
+    """
+    if len(matrix) != 16:
+        raise ValueError("matrix must have 16 cells")
+    state = 0
+    for i, v in enumerate(matrix):
+        if v:
+            if not 0 < v <= MAX_NIBBLE:
+                raise ValueError("value out of range: {}".format(v))
+            state |= v << (4 * i)
+    return state
+
+
+def decode(state):
+    """ Convert a bitboard to a 16-item matrix like Board.matrix. """
+    cells = ROW_CELLS
+    return [*cells[state & ROW_MASK], *cells[(state >> 16) & ROW_MASK],
+            *cells[(state >> 32) & ROW_MASK], *cells[state >> 48]]
+
+
+def free_cells(state):
+    """ Returns a list of the positions of the empty cells of a bitboard,
+    in order. """
+    empty = ROW_EMPTY
+    return ([i for i in empty[state & ROW_MASK]]
+            + [4 + i for i in empty[(state >> 16) & ROW_MASK]]
+            + [8 + i for i in empty[(state >> 32) & ROW_MASK]]
+            + [12 + i for i in empty[state >> 48]])
+
+
+def _move_left(state):
+    """ Move a bitboard to the left. See move_state(). """
+    table, points = ROW_LEFT, POINTS_LEFT
+    r0 = state & ROW_MASK
+    r1 = (state >> 16) & ROW_MASK
+    r2 = (state >> 32) & ROW_MASK
+    r3 = state >> 48
+    return (table[r0] | (table[r1] << 16) | (table[r2] << 32)
+            | (table[r3] << 48),
+            points[r0] + points[r1] + points[r2] + points[r3])
+
+
+def _move_right(state):
+    """ Move a bitboard to the right. See move_state(). """
+    table, points = ROW_RIGHT, POINTS_RIGHT
+    r0 = state & ROW_MASK
+    r1 = (state >> 16) & ROW_MASK
+    r2 = (state >> 32) & ROW_MASK
+    r3 = state >> 48
+    return (table[r0] | (table[r1] << 16) | (table[r2] << 32)
+            | (table[r3] << 48),
+            points[r0] + points[r1] + points[r2] + points[r3])
+
+
+def _move_up(state):
+    """ Move a bitboard up. The columns of the board are the rows of its
+    transpose, and the column tables put each moved row straight back
+    into a column. See move_state(). """
+    table, points = COL_UP, POINTS_LEFT
+    t = transpose_state(state)
+    r0 = t & ROW_MASK
+    r1 = (t >> 16) & ROW_MASK
+    r2 = (t >> 32) & ROW_MASK
+    r3 = t >> 48
+    return (table[r0] | (table[r1] << 4) | (table[r2] << 8)
+            | (table[r3] << 12),
+            points[r0] + points[r1] + points[r2] + points[r3])
+
+
+def _move_down(state):
+    """ Move a bitboard down. See _move_up() and move_state(). """
+    table, points = COL_DOWN, POINTS_RIGHT
+    t = transpose_state(state)
+    r0 = t & ROW_MASK
+    r1 = (t >> 16) & ROW_MASK
+    r2 = (t >> 32) & ROW_MASK
+    r3 = t >> 48
+    return (table[r0] | (table[r1] << 4) | (table[r2] << 8)
+            | (table[r3] << 12),
+            points[r0] + points[r1] + points[r2] + points[r3])
+
+
+# the function that moves a bitboard in each direction
+MOVES = {"up": _move_up, "down": _move_down, "left": _move_left,
+         "right": _move_right}
+# the index of each direction in DIRECTIONS
+DIRECTION_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+
+
+def move_states(state):
+    """ Move a bitboard in every direction at once. The board is split
+    into rows and transposed only once for all four directions.
+
+    Args:
+        state (int): a bitboard.
+
+    Returns:
+        list of tuple of int, int: the new bitboard and the points
+        earned for each direction, in the order of DIRECTIONS. If a
+        move is not possible, its new bitboard equals state.
+    """
+    r0 = state & ROW_MASK
+    r1 = (state >> 16) & ROW_MASK
+    r2 = (state >> 32) & ROW_MASK
+    r3 = state >> 48
+    t = transpose_state(state)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = t >> 48
+    up, down, left, right = COL_UP, COL_DOWN, ROW_LEFT, ROW_RIGHT
+    pl, pr = POINTS_LEFT, POINTS_RIGHT
+    return [(up[c0] | (up[c1] << 4) | (up[c2] << 8) | (up[c3] << 12),
+             pl[c0] + pl[c1] + pl[c2] + pl[c3]),
+            (down[c0] | (down[c1] << 4) | (down[c2] << 8) | (down[c3] << 12),
+             pr[c0] + pr[c1] + pr[c2] + pr[c3]),
+            (left[r0] | (left[r1] << 16) | (left[r2] << 32)
+             | (left[r3] << 48),
+             pl[r0] + pl[r1] + pl[r2] + pl[r3]),
+            (right[r0] | (right[r1] << 16) | (right[r2] << 32)
+             | (right[r3] << 48),
+             pr[r0] + pr[r1] + pr[r2] + pr[r3])]
+
+
+def move_state(state, direction):
+    """ Determine how a bitboard would change and how many points would
+    be earned if it were moved in a specific direction.
+
+    Args:
+        state (int): a bitboard.
+        direction (str): should be "up", "down", "left", or "right".
+
+    Returns:
+        tuple of int, int: the new bitboard and the points earned. If
+        the move is not possible, the new bitboard equals state.
+
+    Raises:
+        ValueError: specified direction is not a recognized direction.
+    """
+    move = MOVES.get(direction)
+    if move is None:
+        raise ValueError("invalid direction: {}".format(direction))
+    return move(state)
+
+
+class BitBoard(Board):
+    """ A 4x4 Board that stores its cells in a single 64-bit integer and
+    moves them using precomputed row tables. It supports the same
+    methods as Board; matrix is computed from the bitboard when it is
+    read and converted to a bitboard when it is assigned.
+
+    The first of valid_moves(), has_valid_move(), or calculate_state()
+    to need a move for the current state computes all four, and the
+    others (and move()) reuse them until the state changes. A typical
+    turn of a game therefore moves the board four times, not five.
+
+    Attributes:
+        width (int): always 4.
+        state (int): the board, represented as a bitboard (see the
+            module docstring).
+        cache (dict of str: tuple of (list of (int or None)), int):
+            results of previous calls to the calculate_move() method for
+            the current state of the board.
+    """
+    # the state whose moves are in _successors (see successor_states())
+    _successors_of = None
+    _successors = None
+
+    def __init__(self, width=4):
+        """ Create a board containing two randomly-placed starting
+        numbers.
+
+        Args:
+            width (int): must be 4.
+
+        Side effects:
+            Sets attributes width, state, and cache.
+
+        Raises:
+            ValueError: specified width is not 4.
+        """
+        if width != 4:
+            raise ValueError("BitBoard only supports a width of 4")
+        self.state = 0
+        super().__init__(width)
+
+    @property
+    def matrix(self):
+        """ list of (int or None): the board as a one-dimensional list,
+        as in Board. Modifying the list does not modify the board;
+        assign to matrix instead. """
+        return decode(self.state)
+
+    @matrix.setter
+    def matrix(self, matrix):
+        self.state = encode(matrix)
+
+    def successor_states(self):
+        """ Move the board in every direction without changing it.
+
+        Returns:
+            list of tuple of int, int: the new bitboard and the points
+            earned for each direction, in the order of DIRECTIONS. A
+            new bitboard equal to state means the move is not valid.
+        """
+        state = self.state
+        if self._successors_of != state:
+            if self.stats is not None:
+                self.stats.computations += len(DIRECTIONS)
+            self._successors = move_states(state)
+            self._successors_of = state
+        return self._successors
+
+    def is_winner(self):
+        """ Returns True if the current state of the board reflects a
+        win, i.e., some nibble is at least 11 (binary 1011): its top bit
+        is set along with bit 2 or both of bits 0 and 1. """
+        state = self.state
+        return bool((state >> 3) & ((state >> 2) | ((state >> 1) & state))
+                    & LOW_BITS)
+
+    def max_tile(self):
+        """ Returns the largest number on the board, or 0 if the board is
+        empty. """
+        state = self.state
+        return max(ROW_MAX[state & ROW_MASK],
+                   ROW_MAX[(state >> 16) & ROW_MASK],
+                   ROW_MAX[(state >> 32) & ROW_MASK],
+                   ROW_MAX[state >> 48])
+
+    def tile_counts(self):
+        """ Returns a dict mapping each number on the board to the number
+        of cells that contain it. """
+        counts = {}
+        for n in decode(self.state):
+            if n:
+                counts[n] = counts.get(n, 0) + 1
+        return counts
+
+    def has_valid_move(self):
+        """ Returns True if at least one move is valid. """
+        state = self.state
+        for new_state, points in self.successor_states():
+            if new_state != state:
+                return True
+        return False
+
+    def free_spaces(self):
+        """ Returns a list of indices in self.matrix where the value is
+        None. (These are available spaces.) """
+        return free_cells(self.state)
+
+    def new_number(self):
+        """ Insert a 1 or a 2 in a random position on the board. The
+        empty cells are found with a table lookup per row. """
+        state = self.state
+        rows = (ROW_EMPTY[state & ROW_MASK],
+                ROW_EMPTY[(state >> 16) & ROW_MASK],
+                ROW_EMPTY[(state >> 32) & ROW_MASK],
+                ROW_EMPTY[state >> 48])
+        i = random.randrange(len(rows[0]) + len(rows[1]) + len(rows[2])
+                             + len(rows[3]))
+        pos = 0
+        for empty in rows:
+            if i < len(empty):
+                pos += empty[i]
+                break
+            i -= len(empty)
+            pos += 4
+        num = 1 if random.random() < PROB_1 else 2
+        self.state = state | (num << (4 * pos))
+        return pos, num
+
+    def calculate_state(self, direction):
+        """ Like calculate_move(), but return the new state of the board
+        as a bitboard. If stats is set, this is where calls and cache
+        hits are counted, since move() and calculate_move() both come
+        through here.
+
+        Args:
+            direction (str): should be "up", "down", "left", or "right".
+
+        Returns:
+            tuple of int, int: the new bitboard and the points earned.
+
+        Raises:
+            ValueError: specified direction is not a recognized
+                direction.
+            DirectionError: specified direction is not valid given the
+                current state of the board.
+        """
+        i = DIRECTION_INDEX.get(direction)
+        if i is None:
+            raise ValueError("invalid direction: {}".format(direction))
+        stats = self.stats
+        if stats is not None:
+            stats.calculate_calls += 1
+            if self._successors_of == self.state:
+                stats.cache_hits += 1
+        new_state, points = self.successor_states()[i]
+        if new_state == self.state:
+            raise DirectionError
+        return new_state, points
+
+    def calculate_move(self, direction):
+        """ Without changing the board itself, determine how the current
+        board would change and how many points the user would earn if
+        the board were moved in a specific direction. See
+        Board.calculate_move().
+
+        Side effects:
+            May modify self.cache.
+        """
+        if direction in self.cache:
+            stats = self.stats
+            if stats is not None:
+                stats.calculate_calls += 1
+                stats.cache_hits += 1
+            if self.cache[direction] == DirectionError:
+                raise DirectionError
+            return self.cache[direction]
+        try:
+            new_state, points = self.calculate_state(direction)
+        except DirectionError:
+            self.cache[direction] = DirectionError
+            raise
+        self.cache[direction] = decode(new_state), points
+        return self.cache[direction]
+
+    def successors(self):
+        """ Without changing the board itself, determine how the current
+        board would change and how many points the user would earn for
+        every direction. See Board.successors().
+
+        Side effects:
+            Fills self.cache.
+        """
+        cache = self.cache
+        if len(cache) < len(DIRECTIONS):
+            state = self.state
+            for d, (new_state, points) in zip(DIRECTIONS,
+                                              self.successor_states()):
+                if d not in cache:
+                    cache[d] = (decode(new_state), points) \
+                        if new_state != state else DirectionError
+        return cache
+
+    def move(self, direction):
+        """ Move the contents of the board in the specified direction.
+
+        Args:
+            direction (str): should be "up", "down", "left", or "right".
+
+        Returns:
+            int: the number of points earned for this move.
+
+        Side effects:
+            Alters self.state and self.cache.
+
+        Raises:
+            ValueError: specified direction is not a recognized
+                direction.
+            DirectionError: specified direction is not valid given the
+                current state of the board.
+        """
+        new_state, points = self.calculate_state(direction)
+        if self.cache:
+            self.cache.clear()
+        self.state = new_state
+        return points
+
+    def is_valid_move(self, direction):
+        """ Determines whether the specified direction is a valid move
+        given the current state of the board. """
+        i = DIRECTION_INDEX.get(direction)
+        if i is None:
+            raise ValueError("invalid direction: {}".format(direction))
+        return self.successor_states()[i][0] != self.state
+
+    def valid_moves(self):
+        """ Return a list of all possible moves given the current state
+        of the board. """
+        state = self.state
+        return [d for d, (new_state, points)
+                in zip(DIRECTIONS, self.successor_states())
+                if new_state != state]
+
+    def snapshot(self):
+        """ Record the current state of the board; see Board.snapshot().
+
+        Returns:
+            int: the bitboard.
+        """
+        return self.state
+
+    def restore(self, snapshot):
+        """ Put back a state of the board recorded by snapshot().
+
+        Side effects:
+            Alters self.state and self.cache.
+        """
+        self.state = snapshot
+        self.cache.clear()
+
+    def __copy__(self):
+        """ Create a copy of a BitBoard object. Because the board is
+        stored in an integer, this is as safe as __deepcopy__(). """
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.width = self.width
+        new_board.state = self.state
+        new_board.cache = {}
+        return new_board
+
+    def __eq__(self, other):
+        """ Define the behavior of the == operator for BitBoard
+        objects. """
+        if isinstance(other, BitBoard):
+            return self.state == other.state
+        return super().__eq__(other)
@@ -7,10 +7,12 @@ In the original, like numbers sum together to form increasing powers of
 integers. You can think of these numbers as exponents of the number 2.
 """
 
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from math import isqrt
 import os
 import platform
 import random
+import time
 
 
 # the probability of getting a 1 rather than a 2
@@ -25,6 +27,98 @@ class DirectionError(Exception):
     pass
 
 
+# the cells of each row or column of a board, in the order they are
+# moved, for each board size and direction (see lines())
+_LINES = {}
+
+
+def lines(size, direction):
+    """ Returns the cells of each row (for "left" and "right") or column
+    (for "up" and "down") of a board with size cells, each ordered so
+    that the first is the one in the direction of the move. """
+    key = size, direction
+    if key not in _LINES:
+        width = isqrt(size)
+        vertical = direction in ["up", "down"]
+        reverse = direction in ["down", "right"]
+        result = []
+        for i in range(width):
+            cells = (range(i, size, width) if vertical
+                     else range(i * width, (i + 1) * width))
+            result.append(tuple(cells[::-1] if reverse else cells))
+        _LINES[key] = result
+    return _LINES[key]
+
+
+def move_cells(matrix, direction):
+    """ Move a board in one direction, like apply_move(), and also report
+    which cells are empty afterwards and which numbers were made by
+    merges, so that a Board can update what it keeps track of without
+    looking at every cell again. Does not check direction.
+    
+    Args:
+        matrix (list or tuple of (int or None)): a board, laid out like
+            Board.matrix.
+        direction (str): "up", "down", "left", or "right".
+    
+    Returns:
+        tuple of (list of (int or None)), int, (list of int), (list of
+        int): the new state of the board, the points earned, the
+        positions of its empty cells (in no particular order), and the
+        number made by each merge.
+    """
+    new_matrix = [None] * len(matrix)
+    points = 0
+    free = []
+    merged = []
+    for cells in lines(len(matrix), direction):
+        # slide the numbers toward cells[0], merging like numbers
+        k = 0
+        last = None
+        for c in cells:
+            v = matrix[c]
+            if not v:
+                continue
+            if v == last:
+                v += 1
+                new_matrix[cells[k - 1]] = v
+                points += v * v
+                merged.append(v)
+                last = None
+            else:
+                new_matrix[cells[k]] = v
+                k += 1
+                last = v
+        free.extend(cells[k:])
+    return new_matrix, points, free, merged
+
+
+def apply_move(matrix, direction):
+    """ Determine how a board would change and how many points would be
+    earned if it were moved in a specific direction. Unlike
+    Board.calculate_move(), this does not need a Board object; it does
+    not use the random module, does not touch any cache, and does not
+    modify matrix.
+    
+    Args:
+        matrix (list or tuple of (int or None)): a board, laid out like
+            Board.matrix.
+        direction (str): should be "up", "down", "left", or "right".
+    
+    Returns:
+        tuple of (list of (int or None)), int, bool: the new state of
+        the board, the points earned, and whether the board changed.
+        (If it did not, the direction is not a valid move.)
+    
+    Raises:
+        ValueError: specified direction is not a recognized direction.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError("invalid direction: {}".format(direction))
+    new_matrix, points, free, merged = move_cells(matrix, direction)
+    return new_matrix, points, new_matrix != list(matrix)
+
+
 class Board:
     """A modified 2048 board. In 2048, the non-empty cells contain
     powers of 2. In this game, they contain numbers 1-11, which can be 
@@ -40,7 +134,20 @@ class Board:
             results of previous calls to the calculate_move() method for
             the current state of the board. (Saves some time at the
             expense of some memory.)
+    
+    The board keeps track of its empty cells, how many of each number it
+    contains, and its largest number as numbers are moved and added, so
+    that new_number(), is_winner(), max_tile(), and has_valid_move() do
+    not have to look at every cell. move() updates them from the merges
+    it makes (see move_cells()); only assigning to matrix recounts them.
+    This only works if the board is changed through its methods or by
+    assigning to matrix; do not change the items of matrix directly.
+    
+    If stats is set to a PlayStats object, calculate_move() counts its
+    calls and cache hits there, and the board counts each move it has
+    to compute. (Player.play() sets this up.)
     """
+    stats = None
     
     def __init__(self, width=4):
         """ Create a board of the specified size containing two
@@ -64,22 +171,75 @@ class Board:
         for i in range(2):
             self.new_number()
             
+    @property
+    def matrix(self):
+        """ list of (int or None): the board, represented as a one-
+        dimensional list (see the class docstring). """
+        return self._matrix
+    
+    @matrix.setter
+    def matrix(self, matrix):
+        """ Replace the contents of the board and recount its empty
+        cells and numbers. """
+        self._matrix = matrix
+        self._free = [i for i, space in enumerate(matrix) if space is None]
+        counts = {}
+        for n in matrix:
+            if n is not None:
+                counts[n] = counts.get(n, 0) + 1
+        self._counts = counts
+        self._max = max(counts) if counts else 0
+        self._changes = {}
+    
     def is_winner(self):
         """ Returns True if the current state of the board reflects a
         win. """
-        return 11 in self.matrix
+        return self._max >= 11
+    
+    def max_tile(self):
+        """ Returns the largest number on the board, or 0 if the board is
+        empty. """
+        return self._max
+    
+    def tile_counts(self):
+        """ Returns a dict mapping each number on the board to the number
+        of cells that contain it. """
+        return dict(self._counts)
     
     def free_spaces(self):
         """ Returns a list of indices in self.matrix where the value is
-        None. (These are available spaces.) """
-        return [i for i, space in enumerate(self.matrix) if space is None]
+        None, in no particular order. (These are available spaces.) """
+        return list(self._free)
+    
+    def count_free(self, matrix):
+        """ Returns the number of empty cells in a state of the board, such
+        as one returned by calculate_move() or successors(). Players
+        should use this rather than counting the cells themselves, since
+        subclasses of Board may store states differently. """
+        return matrix.count(None)
     
     def new_number(self):
         """ Insert a 1 or a 2 in a random position on the board. """
-        pos = random.choice(self.free_spaces())
+        free = self._free
+        i = random.randrange(len(free))
+        pos = free[i]
+        free[i] = free[-1]
+        free.pop()
         num = 1 if random.random() < PROB_1 else 2
-        self.matrix[pos] = num
+        self._matrix[pos] = num
+        self._counts[num] = self._counts.get(num, 0) + 1
+        if num > self._max:
+            self._max = num
         return pos, num
+    
+    def has_valid_move(self):
+        """ Returns True if at least one move is valid. If the board has
+        an empty cell and a number, some number must be next to an empty
+        cell and can move into it, so the cells only need to be compared
+        when the board is full. """
+        if self._free and self._max:
+            return True
+        return bool(self.valid_moves())
 
     def get_coord(self, pos):
         """ Convert pos to x, y coordinates.
@@ -129,9 +289,6 @@ class Board:
         Raises:
             ValueError: at least one coordinate was out of range.
         """
-        for coord, letter in [(x, "x"), (y, "y")]:
-            if not (0 <= coord < self.width):
-                raise ValueError("{} coordinate out of range".format(letter))
         return self.matrix[self.get_pos(x, y)]
     
     def get_slice(self, coord, axis=0, matrix=None):
@@ -216,44 +373,64 @@ class Board:
         Side effects:
             May modify self.cache.
         """
+        stats = self.stats
+        if stats is not None:
+            stats.calculate_calls += 1
         if direction in self.cache:
+            if stats is not None:
+                stats.cache_hits += 1
             if self.cache[direction] == DirectionError:
                 raise DirectionError
             else:
                 return self.cache[direction]
         if not self.is_valid_direction(direction):
             raise ValueError("invalid direction: {}".format(direction))
-        axis = 1 if direction in ["up", "down"] else 0
-        reverse = direction in ["down", "right"]
-        new_matrix = []
-        points = 0
-        for i in range(self.width):
-            values = [v for v in self.get_slice(i, axis=axis) if v]
-            if reverse:
-                values.reverse()
-            new_values = []
-            while values:
-                v1 = values.pop(0)
-                if v1 is None:
-                    continue
-                if values and values[0] == v1:
-                    values.pop(0)
-                    new_values.append(v1+1)
-                    points += (v1 + 1) ** 2
-                else:
-                    new_values.append(v1)
-            if len(new_values) < self.width:
-                new_values += [None] * (self.width - len(new_values))
-            if reverse:
-                new_values.reverse()
-            new_matrix.extend(new_values)
-        if axis == 1:
-            new_matrix = self.transpose(new_matrix)
-        if new_matrix == self.matrix:
-            self.cache[direction] = DirectionError
+        result = self._compute(direction)
+        if result == DirectionError:
             raise DirectionError
-        self.cache[direction] = new_matrix, points
-        return new_matrix, points
+        return result
+    
+    def _compute(self, direction):
+        """ Move the board in one direction without changing it, and
+        store the result in self.cache (see successors()). Only the
+        requested direction is computed.
+        
+        Side effects:
+            Modifies self.cache.
+        """
+        if self.stats is not None:
+            self.stats.computations += 1
+        matrix, points, free, merged = move_cells(self.matrix, direction)
+        if matrix == self.matrix:
+            result = DirectionError
+        else:
+            result = (matrix, points)
+            self._changes[direction] = (result, free, merged)
+        self.cache[direction] = result
+        return result
+    
+    def successors(self):
+        """ Without changing the board itself, determine how the current
+        board would change and how many points the user would earn for
+        every direction. Directions already in the cache are not
+        computed again.
+        
+        Returns:
+            dict of str: (tuple of (list of (int or None)), int) or
+            DirectionError: for each direction, the new state of the
+            board and the points that would be earned, or
+            DirectionError if the move is not valid. This is self.cache;
+            do not modify it.
+        
+        Side effects:
+            Fills self.cache.
+        """
+        cache = self.cache
+        if len(cache) < len(DIRECTIONS):
+            for d in DIRECTIONS:
+                if d not in cache:
+                    self._compute(d)
+        return cache
     
     def move(self, direction):
         """ Move the contents of the board in the specified direction.
@@ -265,7 +442,8 @@ class Board:
             int: the number of points earned for this move.
         
         Side effects:
-            Alters self.matrix and self.cache.
+            Alters self.matrix and self.cache, and updates the empty
+            cells and numbers that the board keeps track of.
         
         Raises:
             ValueError: specified direction is not valid given the
@@ -274,11 +452,30 @@ class Board:
         if not self.is_valid_direction(direction):
             raise ValueError("invalid direction: {}".format(direction))
         try:
-            matrix, points = self.calculate_move(direction)
+            result = self.calculate_move(direction)
         except DirectionError:
             raise
+        matrix, points = result
+        change = self._changes.get(direction)
         self.cache.clear()
-        self.matrix = matrix
+        if change is None or change[0] is not result:
+            # the cache was filled some other way; recount everything
+            self.matrix = matrix
+            return points
+        result, free, merged = change
+        counts = self._counts
+        for n in merged:
+            # two (n - 1)s became one n
+            if counts[n - 1] == 2:
+                del counts[n - 1]
+            else:
+                counts[n - 1] -= 2
+            counts[n] = counts.get(n, 0) + 1
+            if n > self._max:
+                self._max = n
+        self._matrix = matrix
+        self._free = free
+        self._changes = {}
         return points
     
     def is_valid_move(self, direction):
@@ -288,23 +485,23 @@ class Board:
         to a different location as a result of the move. """
         if not self.is_valid_direction(direction):
             raise ValueError("invalid direction: {}".format(direction))
-        try:
-            self.calculate_move(direction)
-        except DirectionError:
-            return False
-        return True
+        result = self.cache.get(direction)
+        if result is None:
+            result = self._compute(direction)
+        return result != DirectionError
 
     def valid_moves(self):
         """ Return a list of all possible moves given the current state
         of the board. """
-        return [d for d in DIRECTIONS if self.is_valid_move(d)]
+        cache = self.successors()
+        return [d for d in DIRECTIONS if cache[d] != DirectionError]
     
 
     def __str__(self):
         """ Convert the board to a string representation suitable for
         printing to the console. """
         rows = []
-        max_val = max(n or 0 for n in self.matrix)
+        max_val = self.max_tile()
         min_width = max(len(str(max_val)), 2)
         cell_template = "{:>MWs}".replace("MW", str(min_width))
         row_template = "|" + "|".join([cell_template]*self.width) + "|"
@@ -316,22 +513,43 @@ class Board:
             rows.append(line)
         return "\n".join(rows)
     
+    def snapshot(self):
+        """ Record the current state of the board cheaply, so that it can
+        be put back later with restore(). This is meant for players that
+        try out many moves on the same board.
+        
+        Returns:
+            tuple of (int or None): the contents of the board.
+        """
+        return tuple(self.matrix)
+    
+    def restore(self, snapshot):
+        """ Put back a state of the board recorded by snapshot().
+        
+        Args:
+            snapshot (tuple of (int or None)): a value returned by
+                snapshot().
+        
+        Side effects:
+            Alters self.matrix and self.cache.
+        """
+        self.matrix = list(snapshot)
+        self.cache.clear()
+    
     def __copy__(self):
-        """ Create a shallow copy of a Board object. It's safer to use
-        __deepcopy__() instead of __copy__()."""
-        new_board = Board(width=self.width)
-        new_board.matrix = self.matrix
-        new_board.cache = self.cache
+        """ Create a copy of a Board object. The copy does not share
+        self.matrix with the original, starts with an empty cache, and
+        has no random numbers placed on it. (The numbers on the board
+        are immutable, so this is as safe as __deepcopy__().)"""
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.__dict__.update(self.__dict__)
+        new_board.matrix = list(self.matrix)
+        new_board.cache = {}
         return new_board
     
     def __deepcopy__(self, memo=None):
         """ Create a deep copy of a Board object. """
-        if memo is None:
-            memo = {}
-        new_board = Board(width=self.width)
-        new_board.matrix = deepcopy(self.matrix, memo=memo)
-        new_board.cache = deepcopy(self.cache, memo=memo)
-        return new_board
+        return self.__copy__()
         
     def __eq__(self, other):
         """ Define the behavior of the == operator for Board objects. """
@@ -352,23 +570,74 @@ class Player:
     Attributes:
         board (Board): the game board.
         score (int): the player's score.
+        moves (int): the number of moves the player has made.
+        board_class (type): the class used to create the board. Set
+            this to a subclass of Board (such as bitboard.BitBoard) in a
+            subclass of Player to use a different board backend.
+        recorder (recording.GameWriter or None): if not None, play()
+            records the game with it (see recording.py).
+        stats (PlayStats or None): if not None, play() records how long
+            each part of each move takes, and how well the board's cache
+            works, in it.
+        hook (callable or None): if not None, play() calls it after each
+            move as hook(player, direction, timings), where timings is a
+            dict of the seconds spent in "get_move", "move", and
+            "new_number".
     """
+    board_class = Board
+    recorder = None
+    stats = None
+    hook = None
+
     def __init__(self):
         """ Create a new player object. """
-        self.board = Board()
+        self.board = self.board_class()
         self.score = 0
+        self.moves = 0
     
     def play(self):
         """ Play a game of 2048. As long as the game has not been won or
         lost, Call self.get_move() to find out the player's move. Then
         update the board and score accordingly. """
-        while self.board.valid_moves() and not self.board.is_winner():
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.start_game(self.board)
+        stats, hook = self.stats, self.hook
+        timed = stats is not None or hook is not None
+        if stats is not None:
+            self.board.stats = stats
+        won = False
+        while self.board.has_valid_move() and not self.board.is_winner():
+            if timed:
+                t0 = time.perf_counter()
             direction = self.get_move()
+            if timed:
+                t1 = time.perf_counter()
             self.score += self.board.move(direction)
+            self.moves += 1
+            if timed:
+                t2 = time.perf_counter()
             if self.board.is_winner():
-                return True
-            self.board.new_number()
-        return False
+                spawn = None
+                won = True
+            else:
+                spawn = self.board.new_number()
+            if recorder is not None:
+                recorder.record_move(direction, spawn)
+            if timed:
+                timings = {"get_move": t1 - t0, "move": t2 - t1,
+                           "new_number": time.perf_counter() - t2}
+                if stats is not None:
+                    stats.record_move(timings)
+                if hook is not None:
+                    hook(self, direction, timings)
+            if won:
+                break
+        if recorder is not None:
+            recorder.end_game(self.score, won, self.moves)
+        if stats is not None:
+            stats.record_game(self.moves)
+        return won
         
     def get_move(self):
         """ Indicate a direction in which to move the contents of the
@@ -387,6 +656,92 @@ class Player:
         raise NotImplementedError
 
 
+class PlayStats:
+    """ Measurements of where the time goes while games are played. Assign
+    a PlayStats object to Player.stats to collect them; one object can
+    collect measurements from many games.
+    
+    Attributes:
+        games (int): the number of games played.
+        moves (int): the number of moves made.
+        moves_per_game (list of int): the number of moves in each game.
+        times (dict of str: float): the total seconds spent in
+            "get_move", "move", and "new_number".
+        latency (dict of int: int): a histogram of the time taken by
+            get_move(). Each key is a power of 2; its value is the number
+            of decisions that took less than that many microseconds (and
+            at least half as many).
+        calculate_calls (int): the number of times the board was asked
+            for the result of a move, by calculate_move() or move().
+        cache_hits (int): the number of those that were answered from
+            moves the board had already computed.
+        computations (int): the number of moves the board had to
+            compute because they were not in Board.cache.
+    """
+    def __init__(self):
+        """ Create an empty set of measurements. """
+        self.games = 0
+        self.moves = 0
+        self.moves_per_game = []
+        self.times = {"get_move": 0.0, "move": 0.0, "new_number": 0.0}
+        self.latency = {}
+        self.calculate_calls = 0
+        self.cache_hits = 0
+        self.computations = 0
+    
+    def record_move(self, timings):
+        """ Add the timings of one move.
+        
+        Args:
+            timings (dict of str: float): the seconds spent in each part
+                of the move (see the attribute times).
+        """
+        self.moves += 1
+        for phase, seconds in timings.items():
+            self.times[phase] += seconds
+        bucket = 1 << int(timings["get_move"] * 1e6).bit_length()
+        self.latency[bucket] = self.latency.get(bucket, 0) + 1
+    
+    def record_game(self, moves):
+        """ Count one finished game of the specified number of moves. """
+        self.games += 1
+        self.moves_per_game.append(moves)
+    
+    def cache_hit_rate(self):
+        """ Returns the fraction of calculate_move() calls answered from
+        the cache. """
+        if not self.calculate_calls:
+            return 0.0
+        return self.cache_hits / self.calculate_calls
+    
+    def summary(self):
+        """ Returns the measurements as a dict. """
+        return {"games": self.games, "moves": self.moves,
+                "moves_per_game": list(self.moves_per_game),
+                "times": dict(self.times),
+                "latency_us": dict(sorted(self.latency.items())),
+                "calculate_calls": self.calculate_calls,
+                "cache_hits": self.cache_hits,
+                "cache_hit_rate": self.cache_hit_rate(),
+                "computations": self.computations}
+    
+    def __str__(self):
+        """ Describe the measurements in a few lines of text. """
+        lines = ["{} games, {} moves".format(self.games, self.moves)]
+        for phase, seconds in self.times.items():
+            per_move = seconds / self.moves if self.moves else 0.0
+            lines.append("{:<11} {:9.3f} s total {:9.1f} us/move"
+                         .format(phase, seconds, per_move * 1e6))
+        lines.append("calculate_move: {} calls, {} cache hits ({:.0%}), "
+                     "{} computations".format(self.calculate_calls,
+                                              self.cache_hits,
+                                              self.cache_hit_rate(),
+                                              self.computations))
+        for bucket, count in sorted(self.latency.items()):
+            lines.append("get_move < {:>8} us: {}".format(bucket, count))
+        return "\n".join(lines)
+
+
 def clear_screen():
     """ Convenience function that you can use to clear the terminal
     screen after each move. """
@@ -413,3 +768,73 @@ def test_player(cls, iterations=100):
         p.play()
         total += p.score
     return total / iterations
+
+
+def play_seeded_game(cls, seed):
+    """ Have a computer player play one game after seeding the random
+    module, so that the game can be reproduced.
+    
+    Args:
+        cls (Player): a subclass of the Player class.
+        seed (int): the seed for the random module.
+    
+    Returns:
+        tuple of int, bool, int: the score, whether the game was won,
+        and the number of moves made.
+    
+    Side effects:
+        Reseeds the random module.
+    """
+    random.seed(seed)
+    p = cls()
+    p.play()
+    return p.score, p.board.is_winner(), p.moves
+
+
+def test_player_parallel(cls, iterations=100, seed=0, workers=None):
+    """ Like test_player(), but play the games in several worker
+    processes and give each game its own seed, derived from seed, so
+    that the same seed always gives the same results no matter how many
+    workers are used.
+    
+    cls must be importable by the worker processes (i.e., defined at the
+    top level of a module, not in __main__ of an interactive session).
+    
+    Args:
+        cls (Player): a subclass of the Player class.
+        iterations (int): the number of trials to do.
+        seed (int): the master seed. Defaults to 0.
+        workers (int, optional): the number of worker processes. If
+            None, use one per CPU; if 1, play every game in the current
+            process. Defaults to None.
+    
+    Returns:
+        dict: the average score ("mean"), the score of each game
+        ("scores"), the fraction of games that were won ("win_rate"),
+        whether each game was won ("wins"), and the number of moves in
+        each game ("moves").
+    """
+    assert issubclass(cls, Player), "cls must be a subclass of Player"
+    master = random.Random(seed)
+    seeds = [master.getrandbits(64) for i in range(iterations)]
+    if workers == 1:
+        state = random.getstate()
+        results = [play_seeded_game(cls, s) for s in seeds]
+        random.setstate(state)
+    else:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunksize = max(1, iterations // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(play_seeded_game,
+                                        [cls] * iterations, seeds,
+                                        chunksize=chunksize))
+    scores = [score for score, won, moves in results]
+    wins = [won for score, won, moves in results]
+    return {
+        "mean": sum(scores) / iterations,
+        "scores": scores,
+        "win_rate": sum(wins) / iterations,
+        "wins": wins,
+        "moves": [moves for score, won, moves in results],
+    }
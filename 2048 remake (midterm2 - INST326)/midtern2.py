@@ -1,6 +1,10 @@
 from eleven import Player
 from eleven import Board
+from eleven import DIRECTIONS, PROB_1
+from bitboard import BitBoard, move_state, transpose_state
+from collections import OrderedDict
 import random
+import time
 
 class HumanPlayer(Player):
     def __init__(self):
@@ -51,9 +55,10 @@ class ComputerPlayer(Player):
             "left", or "right").
         """
         possible_moves = ['up', 'down', 'left', 'right']
+        valid = self.board.valid_moves()
         while True:
             x = random.choice(possible_moves)
-            if x not in self.board.valid_moves():
+            if x not in valid:
                 continue
             else:
                 return x   
@@ -82,37 +87,317 @@ class ComputerPlayer2(ComputerPlayer):
         #depending on the number of empty spaces each move creates. 
         #More empty spaces on the board means more tiles are combined, which is
         #the main objective of the game and leads to a higher score.
-        x = self.board #store board object in a variable
-        #simulate each possible move, and store the number of empty spaces on 
-        #the board as a result of the move.
-        if 'up' in x.valid_moves():
-            up = self.board.__copy__()
-            up.move('up')
-            len_up = len(up.free_spaces())
-        else:
-            len_up = 0
-        if 'down' in x.valid_moves():
-            down = self.board.__copy__()
-            down.move('down')
-            len_down = len(down.free_spaces())
-        else:
-            len_down = 0
-        if 'left' in x.valid_moves():
-            left = self.board.__copy__()
-            left.move('left')
-            len_left = len(left.free_spaces())
-        else:
-            len_left = 0
-        if 'right' in x.valid_moves():
-            right = self.board.__copy__()
-            right.move('right')
-            len_right = len(right.free_spaces())
-        else:
-            len_right = 0
+        valid = self.board.valid_moves()
+        #look up the result of each possible move (computed once by the
+        #board for all four directions), and store the number of empty
+        #spaces on the board as a result of the move.
+        results = self.board.successors()
+        empty = {}
+        for direction in ['up', 'down', 'left', 'right']:
+            if direction in valid:
+                matrix = results[direction][0]
+                empty[direction] = self.board.count_free(matrix)
+            else:
+                empty[direction] = 0
+        len_up, len_down = empty['up'], empty['down']
+        len_left, len_right = empty['left'], empty['right']
         #compare the number of empty spaces each move leaves on the board 
         lengths = {len_up:"up", len_down:"down", len_left:"left", 
                    len_right:"right"}
         #find the move that leaves the most empty spaces on the board and 
         #returns it
         max_empty_spaces = lengths.get(max(lengths))
-        return max_empty_spaces
\ No newline at end of file
+        return max_empty_spaces
+
+class TranspositionTable:
+    """ A bounded table of search results for board positions, keyed by
+    bitboard (see bitboard.py). When the table is full, the entry that
+    was used least recently is evicted, so the table never holds more
+    than capacity entries.
+
+    Attributes:
+        capacity (int): the maximum number of entries.
+        entries (OrderedDict of int: tuple of (int, float)): the search
+            depth and value of each stored position, least recently used
+            first.
+        hits (int): the number of lookups that found a usable entry.
+        misses (int): the number of lookups that did not.
+        evictions (int): the number of entries evicted so far.
+    """
+    def __init__(self, capacity=200000):
+        """ Create an empty table.
+
+        Args:
+            capacity (int): the maximum number of entries.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, state, depth):
+        """ Look up the value of a position searched to at least the
+        specified depth.
+
+        Args:
+            state (int): the position, as a bitboard.
+            depth (int): the minimum search depth.
+
+        Returns:
+            float or None: the stored value, or None if there is none.
+        """
+        entry = self.entries.get(state)
+        if entry is None or entry[0] < depth:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(state)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, state, depth, value):
+        """ Store the value of a position searched to the specified
+        depth, evicting the least recently used entry if necessary. """
+        self.entries[state] = (depth, value)
+        self.entries.move_to_end(state)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self):
+        """ Returns the fraction of lookups that found a usable entry. """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """ Returns a dict describing how the table has been used. """
+        return {"size": len(self.entries), "capacity": self.capacity,
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate()}
+
+    def clear(self):
+        """ Remove every entry and reset the counters. """
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+class SearchTimeout(Exception):
+    """ Raised inside a search when the time budget for a move has run
+    out. """
+    pass
+
+
+# weights for the heuristic used to evaluate positions
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+_HEURISTIC_TABLE = None
+
+
+def _row_heuristic(row):
+    """ Score one 16-bit row: rows with empty cells, numbers that could
+    merge, and numbers in increasing or decreasing order are better. """
+    values = [(row >> (4 * i)) & 0xF for i in range(4)]
+    empty = values.count(0)
+    merges = 0
+    counter = 0
+    prev = 0
+    for v in values:
+        if v == 0:
+            continue
+        if v == prev:
+            counter += 1
+        elif counter > 0:
+            merges += 1 + counter
+            counter = 0
+        prev = v
+    if counter > 0:
+        merges += 1 + counter
+    mono_left = mono_right = 0.0
+    for i in range(3):
+        a = values[i] ** MONOTONICITY_POWER
+        b = values[i + 1] ** MONOTONICITY_POWER
+        if values[i] > values[i + 1]:
+            mono_left += a - b
+        else:
+            mono_right += b - a
+    total = sum(v ** SUM_POWER for v in values)
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges
+            - MONOTONICITY_WEIGHT * min(mono_left, mono_right)
+            - SUM_WEIGHT * total)
+
+
+def heuristic_table():
+    """ Returns the score of every possible row (see _row_heuristic),
+    building the table the first time it is needed. """
+    global _HEURISTIC_TABLE
+    if _HEURISTIC_TABLE is None:
+        _HEURISTIC_TABLE = [_row_heuristic(row) for row in range(0x10000)]
+    return _HEURISTIC_TABLE
+
+
+def heuristic(state):
+    """ Score a position (a bitboard) by adding up the scores of its
+    rows and columns. """
+    table = _HEURISTIC_TABLE
+    if table is None:
+        table = heuristic_table()
+    t = transpose_state(state)
+    return (table[state & 0xFFFF] + table[(state >> 16) & 0xFFFF]
+            + table[(state >> 32) & 0xFFFF] + table[state >> 48]
+            + table[t & 0xFFFF] + table[(t >> 16) & 0xFFFF]
+            + table[(t >> 32) & 0xFFFF] + table[t >> 48])
+
+
+class SearchPlayer(Player):
+    """ A player that searches ahead to choose its move, using either
+    depth-limited expectimax over the numbers that may appear after
+    each move, or random rollouts (Monte Carlo).
+
+    Expectimax uses iterative deepening: it searches one move ahead,
+    then two, and so on, until max_depth is reached or time_limit runs
+    out, and uses the result of the deepest search that finished. The
+    values of positions are shared among all SearchPlayer objects
+    through a bounded transposition table.
+
+    Attributes:
+        mode (str): "expectimax" or "montecarlo".
+        max_depth (int): the maximum number of moves to look ahead.
+        time_limit (float): the time budget for each move, in seconds.
+        min_probability (float): expectimax does not search branches
+            less likely than this; they are scored with heuristic().
+        table (TranspositionTable): the table shared by all players.
+    """
+    board_class = BitBoard
+    table = TranspositionTable()
+
+    def __init__(self, mode="expectimax", max_depth=3, time_limit=0.05,
+                 min_probability=0.0001):
+        """ Create a new player object. Inherited from Player class.
+        """
+        if mode not in ["expectimax", "montecarlo"]:
+            raise ValueError("invalid mode: {}".format(mode))
+        super().__init__()
+        self.mode = mode
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.min_probability = min_probability
+        self.deadline = None
+        # build the row scores now rather than during the first move,
+        # whose time_limit they would use up
+        heuristic_table()
+
+    def get_move(self):
+        """ Search ahead to find the best direction in which to move the
+        contents of the board.
+
+        Returns:
+            str: the direction in which to move (should be "up", "down",
+            "left", or "right").
+        """
+        #the board keeps these, so moving it afterwards is free
+        state = self.board.state
+        children = []
+        for d, (new_state, points) in zip(DIRECTIONS,
+                                          self.board.successor_states()):
+            if new_state != state:
+                children.append((d, new_state, points))
+        if len(children) == 1:
+            return children[0][0]
+        self.deadline = time.perf_counter() + self.time_limit
+        if self.mode == "montecarlo":
+            return self.rollout_move(children)
+        best = children[0][0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values = {d: self.chance_value(new_state, depth, 1.0)
+                          for d, new_state, points in children}
+            except SearchTimeout:
+                break
+            best = max(values, key=values.get)
+        return best
+
+    def max_value(self, state, depth, probability):
+        """ Returns the value of a position in which the player is to
+        move: the value of the best move, or 0 if no move is possible.
+        """
+        best = 0.0
+        for d in DIRECTIONS:
+            new_state = move_state(state, d)[0]
+            if new_state != state:
+                best = max(best,
+                           self.chance_value(new_state, depth, probability))
+        return best
+
+    def chance_value(self, state, depth, probability):
+        """ Returns the expected value of a position in which a new
+        number is about to appear, searching depth more moves ahead.
+
+        Raises:
+            SearchTimeout: the time budget for this move has run out.
+        """
+        if depth == 0 or probability < self.min_probability:
+            return heuristic(state)
+        value = self.table.get(state, depth)
+        if value is not None:
+            return value
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        empty = [i for i in range(0, 64, 4) if not (state >> i) & 0xF]
+        probability /= len(empty)
+        total = 0.0
+        for i in empty:
+            total += PROB_1 * self.max_value(state | (1 << i), depth - 1,
+                                             probability * PROB_1)
+            total += (1 - PROB_1) * self.max_value(
+                state | (2 << i), depth - 1, probability * (1 - PROB_1))
+        value = total / len(empty)
+        self.table.put(state, depth, value)
+        return value
+
+    def rollout_move(self, children):
+        """ Play random games from the position after each possible move
+        until the time budget runs out, and return the move whose games
+        scored the most points on average.
+
+        Args:
+            children (list of tuple of (str, int, int)): each possible
+                move, the resulting bitboard, and the points earned.
+
+        Returns:
+            str: the chosen direction.
+        """
+        totals = {d: 0 for d, new_state, points in children}
+        while True:
+            for d, new_state, points in children:
+                totals[d] += points + self.rollout(new_state)
+            if time.perf_counter() > self.deadline:
+                break
+        return max(totals, key=totals.get)
+
+    def rollout(self, state):
+        """ Play random moves from a position (in which a new number is
+        about to appear) until the game ends, and return the points
+        earned. """
+        points = 0
+        while True:
+            empty = [i for i in range(0, 64, 4) if not (state >> i) & 0xF]
+            num = 1 if random.random() < PROB_1 else 2
+            state |= num << random.choice(empty)
+            moves = []
+            for d in DIRECTIONS:
+                new_state, new_points = move_state(state, d)
+                if new_state != state:
+                    moves.append((new_state, new_points))
+            if not moves:
+                return points
+            state, new_points = random.choice(moves)
+            points += new_points
+            for i in range(0, 64, 4):
+                if (state >> i) & 0xF == 11:
+                    return points
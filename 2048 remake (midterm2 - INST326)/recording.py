@@ -0,0 +1,282 @@
+""" A compact, append-only binary format for recording games of 2048.
+
+A recording file starts with the 8 bytes in MAGIC, followed by one
+record per game. Games are only ever appended, so several runs can add
+to the same file. All integers are little-endian.
+
+Each game record is:
+
+    header      width (uint16), number of moves (uint32), score
+                (uint32), won (uint8), number of starting numbers
+                (uint16)
+    starts      for each starting number: position, value (uint8)
+    moves       for each move: a code byte and a position
+
+A position is an index into Board.matrix; it takes 1 byte on boards
+with up to 256 cells and 2 bytes otherwise. In a code byte, bits 0-1
+are the direction (an index into eleven.DIRECTIONS), bit 2 is set if a
+new number was added after the move, and bit 3 is set if that number
+was a 2 rather than a 1. If no number was added (the move won the
+game), the position is 0. On a 4x4 board, a move takes 2 bytes.
+"""
+
+import mmap
+import os
+import struct
+
+from eleven import Board, DIRECTIONS
+
+
+MAGIC = b"2048REC\x01"
+HEADER = struct.Struct("<HIIBH")
+SPAWNED = 0x4
+SPAWNED_TWO = 0x8
+
+
+class RecordingError(Exception):
+    """ Raised when a file is not a valid recording. """
+    pass
+
+
+def _position_format(width):
+    """ Returns the struct format character for a position on a board
+    of the specified width. """
+    return "B" if width ** 2 <= 256 else "H"
+
+
+class GameWriter:
+    """ Append games to a recording file. A GameWriter can be assigned
+    to Player.recorder, in which case Player.play() calls start_game(),
+    record_move(), and end_game() as the game is played. Each game is
+    kept in memory until end_game() is called and then written in one
+    piece, so an interrupted game never leaves a partial record.
+
+    Attributes:
+        file (file): the file being written.
+        games (int): the number of games written by this object.
+    """
+
+    def __init__(self, path):
+        """ Open a recording file for appending, creating it if
+        necessary.
+
+        Args:
+            path (str): the path to the file.
+
+        Raises:
+            RecordingError: the file exists but is not a recording.
+        """
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    self.file.close()
+                    raise RecordingError("not a recording: {}"
+                                         .format(path))
+        self.games = 0
+        self._width = None
+        self._starts = None
+        self._moves = None
+        self._move = None
+
+    def start_game(self, board):
+        """ Begin recording a game, starting with the numbers currently
+        on the board.
+
+        Args:
+            board (Board): the board at the start of the game.
+        """
+        self._width = board.width
+        self._move = struct.Struct("<B" + _position_format(board.width))
+        self._starts = [(pos, n) for pos, n in enumerate(board.matrix)
+                        if n is not None]
+        self._moves = bytearray()
+
+    def record_move(self, direction, spawn):
+        """ Record one move.
+
+        Args:
+            direction (str): the direction of the move.
+            spawn (tuple of int, int or None): the position and value of
+                the number added after the move (as returned by
+                Board.new_number()), or None if no number was added.
+        """
+        code = DIRECTIONS.index(direction)
+        pos = 0
+        if spawn is not None:
+            pos, num = spawn
+            code |= SPAWNED
+            if num == 2:
+                code |= SPAWNED_TWO
+        self._moves += self._move.pack(code, pos)
+
+    def end_game(self, score, won, moves):
+        """ Finish recording a game and write it to the file.
+
+        Args:
+            score (int): the final score.
+            won (bool): whether the game was won.
+            moves (int): the number of moves made.
+        """
+        pos = _position_format(self._width)
+        record = bytearray(HEADER.pack(self._width, moves, score, won,
+                                       len(self._starts)))
+        starts = struct.Struct("<" + pos + "B")
+        for start in self._starts:
+            record += starts.pack(*start)
+        record += self._moves
+        self.file.write(record)
+        self.games += 1
+        self._moves = None
+
+    def close(self):
+        """ Close the file. """
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordedGame:
+    """ One game read from a recording file. The moves are decoded only
+    when they are asked for.
+
+    Attributes:
+        width (int): the width of the board.
+        score (int): the final score.
+        won (bool): whether the game was won.
+        num_moves (int): the number of moves made.
+        starts (list of tuple of int, int): the position and value of
+            each starting number.
+    """
+
+    def __init__(self, buffer, offset):
+        """ Read the header of a game.
+
+        Args:
+            buffer (bytes or mmap.mmap): the contents of the recording
+                file.
+            offset (int): the position of the game in buffer.
+        """
+        (self.width, self.num_moves, score, won,
+         num_starts) = HEADER.unpack_from(buffer, offset)
+        self.score = score
+        self.won = bool(won)
+        pos = _position_format(self.width)
+        starts = struct.Struct("<" + pos + "B")
+        offset += HEADER.size
+        self.starts = [starts.unpack_from(buffer, offset + i * starts.size)
+                       for i in range(num_starts)]
+        self._move = struct.Struct("<B" + pos)
+        self._buffer = buffer
+        self._offset = offset + num_starts * starts.size
+        self.end = self._offset + self.num_moves * self._move.size
+
+    def moves(self):
+        """ Decode the moves of the game one at a time.
+
+        Yields:
+            tuple of (str, tuple of int, int or None): the direction of
+            each move and the position and value of the number added
+            after it (or None).
+        """
+        for code, pos in self._move.iter_unpack(
+                self._buffer[self._offset:self.end]):
+            spawn = None
+            if code & SPAWNED:
+                spawn = pos, 2 if code & SPAWNED_TWO else 1
+            yield DIRECTIONS[code & 0x3], spawn
+
+
+class GameReader:
+    """ Read games from a recording file without loading the whole file
+    into memory: the file is memory-mapped and games are decoded as they
+    are iterated over.
+
+    Attributes:
+        path (str): the path to the file.
+    """
+
+    def __init__(self, path):
+        """ Open a recording file.
+
+        Args:
+            path (str): the path to the file.
+
+        Raises:
+            RecordingError: the file is not a recording.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size <= len(MAGIC):
+            self._map = self._file.read()
+        else:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise RecordingError("not a recording: {}".format(path))
+
+    def __iter__(self):
+        """ Iterate over the games in the file.
+
+        Yields:
+            RecordedGame: each game, in the order it was recorded.
+        """
+        buffer = self._map
+        offset = len(MAGIC)
+        while offset < len(buffer):
+            game = RecordedGame(buffer, offset)
+            yield game
+            offset = game.end
+
+    def close(self):
+        """ Close the file. """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def replay(game, board_class=Board):
+    """ Rebuild the boards of a recorded game, one move at a time,
+    without using the random module.
+
+    Args:
+        game (RecordedGame): the game.
+        board_class (type): Board or a subclass of it. Defaults to
+            Board.
+
+    Yields:
+        tuple of Board, int: the board and the score at the start of
+        the game and after each move (including the number added after
+        the move). The same Board object is yielded each time; copy it
+        to keep a state.
+    """
+    board = board_class.__new__(board_class)
+    board.width = game.width
+    board.cache = {}
+    matrix = [None] * game.width ** 2
+    for pos, n in game.starts:
+        matrix[pos] = n
+    board.matrix = matrix
+    score = 0
+    yield board, score
+    for direction, spawn in game.moves():
+        score += board.move(direction)
+        if spawn is not None:
+            pos, n = spawn
+            matrix = board.matrix
+            matrix[pos] = n
+            board.matrix = matrix
+        yield board, score
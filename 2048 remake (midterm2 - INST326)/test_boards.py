@@ -0,0 +1,437 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+import eleven
+from eleven import Board, DirectionError, DIRECTIONS, Player, PlayStats
+from bitboard import BitBoard, decode, encode
+import midtern2
+from midtern2 import (ComputerPlayer, ComputerPlayer2, SearchPlayer,
+                      TranspositionTable)
+from vectorized import (FreeSpaceBatchPlayer, LargeBoard, RandomBatchPlayer,
+                        move_boards, play_batch, valid_mask)
+from recording import GameReader, GameWriter, replay
+
+
+def random_matrix(rng, empty=6):
+    """ Make a random 4x4 board. Each cell is empty with weight empty
+    and holds each of the numbers 1-11 with weight 1. """
+    choices = [None] * empty + list(range(1, 12))
+    return [rng.choice(choices) for i in range(16)]
+
+
+class RandomPlayer(Player):
+    """ A player that makes a random valid move. """
+
+    def get_move(self):
+        return random.choice(self.board.valid_moves())
+
+
+class TestBoard(unittest.TestCase):
+
+    def setUp(self):
+        """make a board on which every move is valid"""
+        self.board = Board()
+        self.board.matrix = [1, None, None, 1,
+                             None, 2, None, None,
+                             None, None, None, None,
+                             2, None, 3, None]
+
+    def test_calculate_move(self):
+        """ calculate_move() only computes the requested direction """
+        matrix, points = self.board.calculate_move("left")
+        self.assertEqual(list(self.board.cache), ["left"])
+        self.assertEqual(matrix[:4], [2, None, None, None])
+        self.assertEqual(points, 4)
+        # the other directions are filled in when they are needed
+        self.assertTrue(self.board.is_valid_move("up"))
+        self.assertEqual(sorted(self.board.cache), ["left", "up"])
+        self.assertEqual(self.board.valid_moves(), DIRECTIONS)
+        self.assertEqual(len(self.board.cache), 4)
+        self.assertEqual(self.board.successors()["left"], (matrix, points))
+
+
+class TestBitBoard(unittest.TestCase):
+
+    def setUp(self):
+        """make a seeded list of boards to compare the two backends on"""
+        rng = random.Random(326)
+        self.matrices = [random_matrix(rng, empty) for empty in range(12)
+                         for i in range(100)]
+        # a full board with no valid move
+        self.matrices.append([1, 2, 1, 2, 2, 1, 2, 1,
+                              1, 2, 1, 2, 2, 1, 2, 1])
+
+    def boards(self, matrix):
+        """ make a Board and a BitBoard with the same contents """
+        board = Board()
+        board.matrix = list(matrix)
+        bitboard = BitBoard()
+        bitboard.matrix = list(matrix)
+        return board, bitboard
+
+    def test_encode(self):
+        """ decode() undoes encode() """
+        for matrix in self.matrices:
+            self.assertEqual(decode(encode(matrix)), matrix)
+
+    def test_calculate_move(self):
+        """ calculate_move() gives the same boards and points as Board """
+        for matrix in self.matrices:
+            board, bitboard = self.boards(matrix)
+            for direction in DIRECTIONS:
+                try:
+                    expected = board.calculate_move(direction)
+                except DirectionError:
+                    with self.assertRaises(DirectionError):
+                        bitboard.calculate_move(direction)
+                    continue
+                self.assertEqual(bitboard.calculate_move(direction),
+                                 expected)
+            # an unknown direction is an error on both
+            with self.assertRaises(ValueError):
+                bitboard.calculate_move("sideways")
+
+    def test_successors(self):
+        """ successors() gives the same results as Board """
+        for matrix in self.matrices:
+            board, bitboard = self.boards(matrix)
+            self.assertEqual(bitboard.successors(), board.successors())
+
+    def test_valid_moves(self):
+        """ valid_moves(), has_valid_move() and is_valid_move() agree with
+        Board """
+        for matrix in self.matrices:
+            board, bitboard = self.boards(matrix)
+            self.assertEqual(bitboard.valid_moves(), board.valid_moves())
+            self.assertEqual(bitboard.has_valid_move(),
+                             board.has_valid_move())
+            for direction in DIRECTIONS:
+                self.assertEqual(bitboard.is_valid_move(direction),
+                                 board.is_valid_move(direction))
+
+    def test_summaries(self):
+        """ free_spaces(), max_tile(), tile_counts() and is_winner()
+        agree with Board """
+        for matrix in self.matrices:
+            board, bitboard = self.boards(matrix)
+            self.assertEqual(sorted(bitboard.free_spaces()),
+                             sorted(board.free_spaces()))
+            self.assertEqual(bitboard.max_tile(), board.max_tile())
+            self.assertEqual(bitboard.tile_counts(), board.tile_counts())
+            self.assertEqual(bitboard.is_winner(), board.is_winner())
+
+    def test_game(self):
+        """ a seeded game played through move() and new_number() goes the
+        same way on both backends """
+        board, bitboard = Board(), BitBoard()
+        bitboard.matrix = list(board.matrix)
+        rng = random.Random(1)
+        for i in range(300):
+            # what Board keeps track of as it moves matches a recount
+            self.assertEqual(sorted(board.free_spaces()), [
+                pos for pos, n in enumerate(board.matrix) if n is None])
+            self.assertEqual(board.tile_counts(), bitboard.tile_counts())
+            self.assertEqual(board.max_tile(), bitboard.max_tile())
+            moves = board.valid_moves()
+            self.assertEqual(bitboard.valid_moves(), moves)
+            if not moves:
+                break
+            direction = rng.choice(moves)
+            self.assertEqual(bitboard.move(direction), board.move(direction))
+            self.assertEqual(bitboard.matrix, board.matrix)
+            # place the new number in the same cell on both boards
+            pos, num = bitboard.new_number()
+            self.assertIn(pos, board.free_spaces())
+            matrix = list(board.matrix)
+            matrix[pos] = num
+            board.matrix = matrix
+            self.assertEqual(bitboard.matrix, board.matrix)
+        # a move that is not valid changes nothing
+        for direction in DIRECTIONS:
+            if direction not in bitboard.valid_moves():
+                before = bitboard.matrix
+                with self.assertRaises(DirectionError):
+                    bitboard.move(direction)
+                self.assertEqual(bitboard.matrix, before)
+
+    def test_snapshot(self):
+        """ restore() puts back a snapshot and forgets the old moves """
+        matrix = [1, None, None, 1] + [None] * 12
+        bitboard = BitBoard()
+        bitboard.matrix = list(matrix)
+        snapshot = bitboard.snapshot()
+        moves = bitboard.valid_moves()
+        bitboard.move("left")
+        bitboard.restore(snapshot)
+        self.assertEqual(bitboard.matrix, matrix)
+        self.assertEqual(bitboard.valid_moves(), moves)
+
+    def test_copy(self):
+        """ copying a BitBoard, or a subclass of it, keeps its class and
+        contents but not its cache """
+        class SubBitBoard(BitBoard):
+            pass
+        for cls in [BitBoard, SubBitBoard]:
+            bitboard = cls()
+            bitboard.valid_moves()
+            copy = bitboard.__copy__()
+            self.assertIs(type(copy), cls)
+            self.assertEqual(copy, bitboard)
+            self.assertEqual(copy.cache, {})
+
+    def test_replay(self):
+        """ a game recorded on a BitBoard replays the same way on both
+        backends """
+        random.seed(2)
+        player = RandomPlayer()
+        player.board_class = BitBoard
+        player.board = BitBoard()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            with GameWriter(path) as writer:
+                player.recorder = writer
+                player.play()
+            with GameReader(path) as reader:
+                game = next(iter(reader))
+                boards = [(list(board.matrix), score)
+                          for board, score in replay(game)]
+                bitboards = [(list(board.matrix), score)
+                             for board, score in replay(game, BitBoard)]
+        self.assertEqual(bitboards, boards)
+        self.assertEqual(boards[-1], (player.board.matrix, player.score))
+
+
+class RecordingBatchPlayer(RandomBatchPlayer):
+    """ A random batch player that remembers every board it was shown
+    and the move it chose. """
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self.history = []
+
+    def get_moves(self, boards, valid):
+        directions = super().get_moves(boards, valid)
+        self.history.append((boards.copy(), directions))
+        return directions
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        """make a seeded batch of boards, with 0 for an empty cell"""
+        rng = random.Random(326)
+        matrices = [random_matrix(rng, empty) for empty in range(12)
+                    for i in range(50)]
+        self.matrices = matrices
+        self.boards = np.array([[v or 0 for v in matrix]
+                                for matrix in matrices], dtype=np.int8)
+
+    def test_move_boards(self):
+        """ move_boards() and valid_mask() agree with Board.move() """
+        valid = valid_mask(self.boards)
+        for d, direction in enumerate(DIRECTIONS):
+            new_boards, points, changed = move_boards(
+                self.boards, np.full(len(self.boards), d))
+            np.testing.assert_array_equal(changed, valid[:, d])
+            for i, matrix in enumerate(self.matrices):
+                board = Board()
+                board.matrix = list(matrix)
+                try:
+                    expected = board.move(direction)
+                except DirectionError:
+                    self.assertFalse(changed[i])
+                    expected = 0
+                self.assertEqual(points[i], expected)
+                self.assertEqual([v or None for v in new_boards[i].tolist()],
+                                 board.matrix)
+
+    def test_mixed_directions(self):
+        """ each board of a batch moves in its own direction """
+        directions = np.arange(len(self.boards)) % len(DIRECTIONS)
+        new_boards, points = move_boards(self.boards, directions)[:2]
+        for d in range(len(DIRECTIONS)):
+            alone = move_boards(self.boards[directions == d],
+                                np.full((directions == d).sum(), d))
+            np.testing.assert_array_equal(new_boards[directions == d],
+                                          alone[0])
+            np.testing.assert_array_equal(points[directions == d], alone[1])
+
+    def test_replay(self):
+        """ each move of a batched game is the move a Board makes, followed
+        by one new 1 or 2, and the points add up to the score """
+        for seed in range(5):
+            player = RecordingBatchPlayer(np.random.default_rng(seed))
+            scores, won, moves, boards = play_batch(player, 1)
+            history = [(board[0], direction[0])
+                       for board, direction in player.history]
+            self.assertEqual(len(history), moves[0])
+            score = 0
+            for i, (before, d) in enumerate(history):
+                board = Board()
+                board.matrix = [v or None for v in before.tolist()]
+                score += board.move(DIRECTIONS[d])
+                after = (history[i + 1][0] if i + 1 < len(history)
+                         else boards[0])
+                added = [(old, new) for old, new in
+                         zip(board.matrix, [v or None for v in after.tolist()])
+                         if old != new]
+                if i + 1 == len(history) and won[0]:
+                    self.assertEqual(added, [])
+                else:
+                    self.assertEqual(len(added), 1)
+                    self.assertIn(added[0], [(None, 1), (None, 2)])
+            self.assertEqual(score, scores[0])
+
+    def test_play_batch(self):
+        """ a seeded batch of games always ends the same way, with every
+        game either won or out of moves """
+        results = []
+        for i in range(2):
+            player = FreeSpaceBatchPlayer(np.random.default_rng(7))
+            results.append(play_batch(player, 20, winning_tile=8))
+        scores, won, moves, boards = results[0]
+        for expected, result in zip(results[0], results[1]):
+            np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(won, boards.max(axis=1) >= 8)
+        self.assertFalse(valid_mask(boards[~won]).any())
+        self.assertEqual(scores.tolist(),
+                         [1662, 683, 987, 1866, 1559, 1566, 1773, 1511, 948,
+                          1342, 1680, 1749, 1395, 1434, 1517, 1340, 1779,
+                          1912, 1447, 1659])
+        self.assertEqual(boards.max(axis=1).tolist(),
+                         [8, 6, 6, 8, 7, 7, 7, 7, 6, 8, 7, 7, 8, 8, 8, 7, 8,
+                          8, 8, 7])
+
+
+class TestLargeBoard(unittest.TestCase):
+
+    def test_count_free(self):
+        """ count_free() works on the arrays that successors() returns """
+        board = LargeBoard(width=8)
+        for direction, result in board.successors().items():
+            if result != DirectionError:
+                self.assertEqual(board.count_free(result[0]),
+                                 board.calculate_move(direction)[0]
+                                 .count(None))
+
+    def test_copy(self):
+        """ copying a LargeBoard, or a subclass of it, keeps its class and
+        does not share cells with the original """
+        class SubLargeBoard(LargeBoard):
+            pass
+        for cls in [LargeBoard, SubLargeBoard]:
+            board = cls(width=6, winning_tile=8)
+            copy = board.__copy__()
+            self.assertIs(type(copy), cls)
+            self.assertEqual(copy, board)
+            self.assertEqual(copy.winning_tile, 8)
+            copy.new_number()
+            self.assertNotEqual(copy, board)
+
+    def test_players(self):
+        """ the computer players can play a whole game on a LargeBoard """
+        random.seed(3)
+        for player_class in [ComputerPlayer, ComputerPlayer2]:
+            player = player_class()
+            player.board = LargeBoard(width=6, winning_tile=8)
+            player.play()
+            self.assertGreater(player.moves, 0)
+            self.assertTrue(player.board.is_winner() or
+                            not player.board.has_valid_move())
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_workers(self):
+        """ test_player_parallel() gives the same results for a seed no
+        matter how many workers play the games, and leaves the random
+        module alone """
+        state = random.getstate()
+        expected = eleven.test_player_parallel(ComputerPlayer2, 6, seed=5,
+                                               workers=1)
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(len(expected["scores"]), 6)
+        for workers in [2, 3]:
+            self.assertEqual(eleven.test_player_parallel(
+                ComputerPlayer2, 6, seed=5, workers=workers), expected)
+        self.assertNotEqual(eleven.test_player_parallel(
+            ComputerPlayer2, 6, seed=6, workers=1)["scores"],
+            expected["scores"])
+
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def setUp(self):
+        """make a small table"""
+        self.table = TranspositionTable(capacity=3)
+
+    def test_depth(self):
+        """ get() only returns values searched at least as deep as asked """
+        self.table.put(1, 2, 10.0)
+        self.assertEqual(self.table.get(1, 1), 10.0)
+        self.assertEqual(self.table.get(1, 2), 10.0)
+        self.assertIsNone(self.table.get(1, 3))
+        self.assertIsNone(self.table.get(2, 0))
+        self.assertEqual((self.table.hits, self.table.misses), (2, 2))
+        self.assertEqual(self.table.hit_rate(), 0.5)
+        # storing a position again replaces its entry
+        self.table.put(1, 3, 20.0)
+        self.assertEqual(self.table.get(1, 3), 20.0)
+
+    def test_eviction(self):
+        """ the table never holds more than capacity entries and evicts the
+        least recently used one """
+        self.assertEqual(self.table.hit_rate(), 0.0)
+        for state in [1, 2, 3]:
+            self.table.put(state, 1, float(state))
+        # using 1 makes 2 the least recently used
+        self.assertEqual(self.table.get(1, 1), 1.0)
+        self.table.put(4, 1, 4.0)
+        self.assertEqual(list(self.table.entries), [3, 1, 4])
+        # a lookup that is too shallow does not count as a use
+        self.assertIsNone(self.table.get(3, 2))
+        self.table.put(5, 1, 5.0)
+        self.assertEqual(list(self.table.entries), [1, 4, 5])
+        self.assertEqual(self.table.evictions, 2)
+        self.assertEqual(self.table.stats(),
+                         {"size": 3, "capacity": 3, "hits": 1, "misses": 1,
+                          "evictions": 2, "hit_rate": 0.5})
+        self.table.clear()
+        self.assertEqual(self.table.stats()["size"], 0)
+        self.assertEqual(self.table.hit_rate(), 0.0)
+
+    def test_heuristic_table(self):
+        """ the row scores are built when a SearchPlayer is made, not
+        during its first move """
+        midtern2._HEURISTIC_TABLE = None
+        SearchPlayer()
+        self.assertEqual(len(midtern2._HEURISTIC_TABLE), 0x10000)
+
+
+class TestPlayStats(unittest.TestCase):
+
+    def test_counters(self):
+        """ every board backend counts its calls, cache hits and
+        computations """
+        random.seed(4)
+        players = [ComputerPlayer2(), ComputerPlayer2(),
+                   SearchPlayer(max_depth=1, time_limit=0.001),
+                   ComputerPlayer2()]
+        players[1].board = BitBoard()
+        players[3].board = LargeBoard(width=6, winning_tile=8)
+        for player in players:
+            stats = PlayStats()
+            player.stats = stats
+            player.play()
+            name = type(player.board).__name__
+            self.assertGreater(stats.calculate_calls, 0, name)
+            self.assertGreater(stats.cache_hits, 0, name)
+            self.assertGreater(stats.computations, 0, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
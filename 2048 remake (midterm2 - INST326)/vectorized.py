@@ -0,0 +1,571 @@
+""" Play many games of 2048 at once with NumPy.
+
+Instead of one Board object per game, a batch of N games is stored as a
+single array of shape (N, width*width). Each row of the array is laid
+out like Board.matrix, except that empty cells hold 0 instead of None.
+Moves, merges, scoring, spawning new numbers, and checking for the end
+of a game are done for every game in the batch with array operations.
+
+Directions are represented as indices into eleven.DIRECTIONS (0 for
+"up", 1 for "down", 2 for "left", and 3 for "right").
+
+The same array operations also move a single large board (see
+LargeBoard), where every row or column is one line of the batch.
+"""
+
+import random
+
+import numpy as np
+
+from eleven import Board, DirectionError, DIRECTIONS, PROB_1
+
+
+# the tile that wins the game
+WINNING_TILE = 11
+# the directions in alphabetical order, and their indices in DIRECTIONS
+_SORTED_DIRECTIONS = np.array(sorted(DIRECTIONS))
+_SORTED_INDICES = np.array([DIRECTIONS.index(d)
+                            for d in sorted(DIRECTIONS)])
+
+
+def tile_dtype(winning_tile):
+    """ Returns the smallest NumPy integer type that can hold every
+    number up to winning_tile. """
+    return np.int8 if winning_tile <= np.iinfo(np.int8).max else np.int16
+
+
+def direction_indices(directions):
+    """ Convert a sequence of directions to indices into DIRECTIONS.
+
+    Args:
+        directions (sequence of (int or str)): directions, either as
+            indices into DIRECTIONS or as strings such as "up".
+
+    Returns:
+        numpy.ndarray of int: the indices.
+    """
+    directions = np.asarray(directions)
+    if directions.dtype.kind in "US":
+        pos = np.searchsorted(_SORTED_DIRECTIONS, directions)
+        pos = np.minimum(pos, len(DIRECTIONS) - 1)
+        if (_SORTED_DIRECTIONS[pos] != directions).any():
+            raise ValueError("invalid direction in {}".format(directions))
+        return _SORTED_INDICES[pos]
+    return directions
+
+
+def slide_lines(lines):
+    """ Move every line of a 2-D array to the left, merging like
+    numbers the way Board.calculate_move() does.
+
+    Args:
+        lines (numpy.ndarray): an array of shape (L, width). Empty cells
+            contain 0.
+
+    Returns:
+        tuple of numpy.ndarray, numpy.ndarray: the moved lines (same
+        shape and dtype as lines) and the points earned by each line.
+    """
+    lines = np.asarray(lines)
+    n, width = lines.shape
+    cols = np.arange(width)
+    # pack the numbers to the left, keeping their order
+    order = np.argsort(lines == 0, axis=1, kind="stable")
+    packed = np.take_along_axis(lines, order, axis=1)
+    # number the cells within each run of equal numbers; the first and
+    # second numbers of a run merge, then the third and fourth, etc.
+    run_start = np.ones((n, width), dtype=bool)
+    run_start[:, 1:] = packed[:, 1:] != packed[:, :-1]
+    first = np.maximum.accumulate(np.where(run_start, cols, 0), axis=1)
+    head = ((cols - first) % 2 == 0) & (packed != 0)
+    head[:, -1] = False
+    head[:, :-1] &= packed[:, 1:] == packed[:, :-1]
+    merged = packed + head
+    tail = np.zeros((n, width), dtype=bool)
+    tail[:, 1:] = head[:, :-1]
+    merged[tail] = 0
+    points = np.where(head, merged.astype(np.int64) ** 2, 0).sum(axis=1)
+    # pack again to close the gaps left by the merged numbers
+    order = np.argsort(merged == 0, axis=1, kind="stable")
+    return np.take_along_axis(merged, order, axis=1), points
+
+
+def _oriented(grids, direction):
+    """ Return a view of grids (shape (N, width, width)) in which
+    moving in the specified direction means moving each row to the
+    left. The view is its own inverse. """
+    if direction == 0:
+        return grids.transpose(0, 2, 1)
+    if direction == 1:
+        return grids.transpose(0, 2, 1)[:, :, ::-1]
+    if direction == 2:
+        return grids
+    return grids[:, :, ::-1]
+
+
+def move_boards(boards, directions):
+    """ Move every board in a batch in its own direction.
+
+    Args:
+        boards (numpy.ndarray): an array of shape (N, width*width).
+        directions (numpy.ndarray of int): N indices into DIRECTIONS.
+
+    Returns:
+        tuple of numpy.ndarray: the new boards (N, width*width), the
+        points earned by each board (N,), and whether each board
+        changed (N,).
+    """
+    n, cells = boards.shape
+    width = int(round(cells ** 0.5))
+    directions = np.asarray(directions)
+    grids = boards.reshape(n, width, width)
+    new_grids = np.empty_like(grids)
+    points = np.zeros(n, dtype=np.int64)
+    for d in range(len(DIRECTIONS)):
+        idx = np.flatnonzero(directions == d)
+        if not len(idx):
+            continue
+        lines = _oriented(grids[idx], d).reshape(-1, width)
+        moved, line_points = slide_lines(lines)
+        _oriented(new_grids, d)[idx] = moved.reshape(-1, width, width)
+        points[idx] = line_points.reshape(-1, width).sum(axis=1)
+    new_boards = new_grids.reshape(n, cells)
+    changed = (new_boards != boards).any(axis=1)
+    return new_boards, points, changed
+
+
+def valid_mask(boards):
+    """ Determine which directions are valid moves for each board.
+
+    A direction is valid if some line, viewed in that direction, has an
+    empty cell followed by a number or two equal numbers next to each
+    other.
+
+    Args:
+        boards (numpy.ndarray): an array of shape (N, width*width).
+
+    Returns:
+        numpy.ndarray of bool: an array of shape (N, 4); column i is
+        True where DIRECTIONS[i] is a valid move.
+    """
+    n, cells = boards.shape
+    width = int(round(cells ** 0.5))
+    grids = boards.reshape(n, width, width)
+    valid = np.empty((n, len(DIRECTIONS)), dtype=bool)
+    for d in range(len(DIRECTIONS)):
+        g = _oriented(grids, d)
+        a, b = g[:, :, :-1], g[:, :, 1:]
+        valid[:, d] = (((a == 0) & (b != 0)) | ((a == b) & (a != 0))
+                       ).any(axis=(1, 2))
+    return valid
+
+
+def new_numbers(boards, rng, which=None):
+    """ Insert a 1 or a 2 in a random empty cell of some boards.
+
+    Args:
+        boards (numpy.ndarray): an array of shape (N, width*width);
+            modified in place.
+        rng (numpy.random.Generator): the source of randomness.
+        which (numpy.ndarray of int, optional): the rows of boards to
+            change. Every row must have an empty cell. If None, change
+            every row. Defaults to None.
+
+    Returns:
+        tuple of numpy.ndarray, numpy.ndarray: the position and value of
+        each new number.
+    """
+    if which is None:
+        which = np.arange(len(boards))
+    keys = rng.random((len(which), boards.shape[1]))
+    keys[boards[which] != 0] = -1
+    pos = keys.argmax(axis=1)
+    num = np.where(rng.random(len(which)) < PROB_1, 1, 2)
+    boards[which, pos] = num
+    return pos, num
+
+
+class BatchPlayer:
+    """ Abstract class for players that choose moves for a whole batch
+    of games at once. Each subclass of this class should, at a minimum,
+    implement the get_moves() method.
+
+    Attributes:
+        rng (numpy.random.Generator): a source of randomness for
+            players that need one.
+    """
+
+    def __init__(self, rng=None):
+        """ Create a new batch player.
+
+        Args:
+            rng (numpy.random.Generator, optional): a source of
+                randomness. If None, create a new one. Defaults to None.
+        """
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def get_moves(self, boards, valid):
+        """ Indicate a direction in which to move each board.
+
+        Args:
+            boards (numpy.ndarray): an array of shape (N, width*width)
+                containing the games that are still being played. Do
+                not modify it.
+            valid (numpy.ndarray of bool): an array of shape (N, 4); see
+                valid_mask().
+
+        Returns:
+            numpy.ndarray: N directions, either as indices into
+            DIRECTIONS or as strings such as "up".
+        """
+        raise NotImplementedError
+
+
+class RandomBatchPlayer(BatchPlayer):
+    """ Choose a random valid move for every game (like
+    midtern2.ComputerPlayer). """
+
+    def get_moves(self, boards, valid):
+        keys = self.rng.random(valid.shape)
+        keys[~valid] = -1
+        return keys.argmax(axis=1)
+
+
+class FreeSpaceBatchPlayer(BatchPlayer):
+    """ Choose the valid move that leaves the most empty cells on each
+    board (like midtern2.ComputerPlayer2). """
+
+    def get_moves(self, boards, valid):
+        free = np.full(valid.shape, -1)
+        for d in range(len(DIRECTIONS)):
+            directions = np.full(len(boards), d)
+            new_boards = move_boards(boards, directions)[0]
+            free[:, d] = (new_boards == 0).sum(axis=1)
+        free[~valid] = -1
+        return free.argmax(axis=1)
+
+
+class LargeBoard(Board):
+    """ A Board for large widths (e.g., 64 or 128), stored in a
+    contiguous NumPy array instead of a list. Rows and columns are
+    moved all at once through strided views of the array (see
+    slide_lines()), so nothing is sliced or transposed in Python.
+
+    The game is the same as with Board, except that the number that
+    wins the game can be set higher than 11.
+
+    Attributes:
+        width (int): an integer not less than 3.
+        winning_tile (int): the number that wins the game.
+        cells (numpy.ndarray): the board, laid out like Board.matrix,
+            with 0 for an empty cell.
+        grid (numpy.ndarray): a (width, width) view of cells.
+        cache (dict of str: tuple of (numpy.ndarray, int)): the new
+            cells and points for each direction, or DirectionError, for
+            the current state of the board (see successors()).
+    """
+    winning_tile = WINNING_TILE
+
+    def __init__(self, width=64, winning_tile=WINNING_TILE):
+        """ Create a board of the specified size containing two
+        randomly-placed starting numbers.
+
+        Args:
+            width (int): an integer not less than 3 representing the
+                width (and height) of the board. Defaults to 64.
+            winning_tile (int): the number that wins the game. Defaults
+                to WINNING_TILE.
+
+        Raises:
+            ValueError: specified width is too small.
+        """
+        self.winning_tile = winning_tile
+        super().__init__(width)
+
+    @property
+    def matrix(self):
+        """ list of (int or None): the board as a one-dimensional list,
+        as in Board. Building this list means looking at every cell, so
+        prefer cells. Modifying the list does not modify the board;
+        assign to matrix instead. """
+        return [n or None for n in self.cells.tolist()]
+
+    @matrix.setter
+    def matrix(self, matrix):
+        self._set_cells(np.array([n or 0 for n in matrix],
+                                 dtype=tile_dtype(self.winning_tile)))
+
+    def _set_cells(self, cells):
+        """ Replace the contents of the board with cells (a flat
+        array). """
+        self.cells = cells
+        self.grid = cells.reshape(self.width, self.width)
+        self._free = int(np.count_nonzero(cells == 0))
+        self._max = int(cells.max())
+
+    def is_winner(self):
+        """ Returns True if the current state of the board reflects a
+        win. """
+        return self._max >= self.winning_tile
+
+    def tile_counts(self):
+        """ Returns a dict mapping each number on the board to the number
+        of cells that contain it. """
+        counts = np.bincount(self.cells)
+        return {n: int(c) for n, c in enumerate(counts) if n and c}
+
+    def free_spaces(self):
+        """ Returns a list of indices in self.matrix where the value is
+        None. (These are available spaces.) """
+        return np.flatnonzero(self.cells == 0).tolist()
+
+    def count_free(self, matrix):
+        """ Returns the number of empty cells in a state of the board. See
+        Board.count_free(); matrix may be a flat array like cells (as
+        returned by successors()) or a list. """
+        if isinstance(matrix, np.ndarray):
+            return len(matrix) - int(np.count_nonzero(matrix))
+        return matrix.count(None)
+
+    def new_number(self):
+        """ Insert a 1 or a 2 in a random position on the board. """
+        i = random.randrange(self._free)
+        pos = int(np.flatnonzero(self.cells == 0)[i])
+        num = 1 if random.random() < PROB_1 else 2
+        self.cells[pos] = num
+        self._free -= 1
+        if num > self._max:
+            self._max = num
+        return pos, num
+
+    def has_valid_move(self):
+        """ Returns True if at least one move is valid. """
+        if self._free and self._max:
+            return True
+        return bool(valid_mask(self.cells[np.newaxis]).any())
+
+    def get_value(self, x, y):
+        """ Get the current value of the cell at position x, y. See
+        Board.get_value(). """
+        return int(self.cells[self.get_pos(x, y)]) or None
+
+    def get_slice(self, coord, axis=0, matrix=None):
+        """ Get one row or column of the board as a list. See
+        Board.get_slice(). """
+        if matrix is not None:
+            return super().get_slice(coord, axis, matrix)
+        if not (0 <= coord < self.width):
+            raise ValueError("coordinate must be between 0 and {}"
+                             .format(self.width - 1))
+        if axis not in [0, 1]:
+            raise ValueError("axis must be 0 (row) or 1 (column)")
+        line = self.grid[coord] if axis == 0 else self.grid[:, coord]
+        return [n or None for n in line.tolist()]
+
+    def _moved(self, direction):
+        """ Move the board in one direction without changing it, and
+        store the result in self.cache.
+
+        Returns:
+            tuple of (numpy.ndarray, int) or DirectionError: the new
+            cells and the points earned, or DirectionError if the move
+            is not valid.
+        """
+        if direction not in self.cache:
+            if self.stats is not None:
+                self.stats.computations += 1
+            d = DIRECTIONS.index(direction)
+            moved, points = slide_lines(_oriented(self.grid[np.newaxis],
+                                                  d)[0])
+            new_grid = np.empty_like(self.grid)
+            _oriented(new_grid[np.newaxis], d)[0] = moved
+            new_cells = new_grid.reshape(-1)
+            if np.array_equal(new_cells, self.cells):
+                self.cache[direction] = DirectionError
+            else:
+                self.cache[direction] = new_cells, int(points.sum())
+        return self.cache[direction]
+
+    def successors(self):
+        """ Determine how the board would change, and how many points
+        would be earned, for every direction. See Board.successors();
+        the new states of the board are flat arrays like cells.
+
+        Side effects:
+            Fills self.cache.
+        """
+        for direction in DIRECTIONS:
+            self._moved(direction)
+        return self.cache
+
+    def valid_moves(self):
+        """ Return a list of all possible moves given the current state
+        of the board. Unlike Board.valid_moves(), this only compares
+        neighboring cells; the boards are not moved. """
+        valid = valid_mask(self.cells[np.newaxis])[0]
+        return [d for d, v in zip(DIRECTIONS, valid) if v]
+
+    def is_valid_move(self, direction):
+        """ Determines whether the specified direction is a valid move
+        given the current state of the board. """
+        if not self.is_valid_direction(direction):
+            raise ValueError("invalid direction: {}".format(direction))
+        return direction in self.valid_moves()
+
+    def calculate_move(self, direction):
+        """ Without changing the board itself, determine how the current
+        board would change and how many points the user would earn if
+        the board were moved in a specific direction. See
+        Board.calculate_move().
+
+        Returns:
+            tuple of (list of (int or None)), int: the new state of the
+                board and the points that would be earned.
+        """
+        cells, points = self.calculate_cells(direction)
+        return [n or None for n in cells.tolist()], points
+
+    def calculate_cells(self, direction):
+        """ Like calculate_move(), but return the new state of the board
+        as a flat array like cells.
+
+        Raises:
+            ValueError: specified direction is not a recognized
+                direction.
+            DirectionError: specified direction is not valid given the
+                current state of the board.
+        """
+        if not self.is_valid_direction(direction):
+            raise ValueError("invalid direction: {}".format(direction))
+        stats = self.stats
+        if stats is not None:
+            stats.calculate_calls += 1
+            if direction in self.cache:
+                stats.cache_hits += 1
+        result = self._moved(direction)
+        if result == DirectionError:
+            raise DirectionError
+        return result
+
+    def move(self, direction):
+        """ Move the contents of the board in the specified direction.
+        See Board.move().
+
+        Side effects:
+            Alters self.cells, self.grid, and self.cache.
+        """
+        cells, points = self.calculate_cells(direction)
+        self.cache.clear()
+        self._set_cells(cells)
+        return points
+
+    def snapshot(self):
+        """ Record the current state of the board; see Board.snapshot().
+
+        Returns:
+            numpy.ndarray: a copy of cells.
+        """
+        return self.cells.copy()
+
+    def restore(self, snapshot):
+        """ Put back a state of the board recorded by snapshot().
+
+        Side effects:
+            Alters self.cells, self.grid, and self.cache.
+        """
+        self._set_cells(snapshot.copy())
+        self.cache.clear()
+
+    def __copy__(self):
+        """ Create a copy of a LargeBoard object that does not share
+        cells with the original. """
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.width = self.width
+        new_board.winning_tile = self.winning_tile
+        new_board.cache = {}
+        new_board._set_cells(self.cells.copy())
+        return new_board
+
+    def __eq__(self, other):
+        """ Define the behavior of the == operator for LargeBoard
+        objects. """
+        if isinstance(other, LargeBoard):
+            return np.array_equal(self.cells, other.cells)
+        return super().__eq__(other)
+
+
+def play_batch(player, games, width=4, rng=None,
+               winning_tile=WINNING_TILE):
+    """ Play several games in lockstep.
+
+    Args:
+        player (BatchPlayer): the player choosing the moves.
+        games (int): the number of games to play.
+        width (int): the width of each board. Defaults to 4.
+        rng (numpy.random.Generator, optional): the source of randomness
+            for new numbers. If None, use player.rng. Defaults to None.
+        winning_tile (int): the number that wins the game. Defaults to
+            WINNING_TILE.
+
+    Returns:
+        tuple of numpy.ndarray: the score of each game, whether each
+        game was won, the number of moves made in each game, and the
+        final boards.
+
+    Raises:
+        ValueError: specified width is too small.
+        DirectionError: the player chose an invalid move.
+    """
+    if width < 3:
+        raise ValueError("width is too small")
+    if rng is None:
+        rng = player.rng
+    boards = np.zeros((games, width ** 2), dtype=tile_dtype(winning_tile))
+    for i in range(2):
+        new_numbers(boards, rng)
+    scores = np.zeros(games, dtype=np.int64)
+    moves = np.zeros(games, dtype=np.int64)
+    won = np.zeros(games, dtype=bool)
+    live = np.arange(games)
+    while len(live):
+        current = boards[live]
+        valid = valid_mask(current)
+        can_move = valid.any(axis=1)
+        live, current, valid = live[can_move], current[can_move], \
+            valid[can_move]
+        if not len(live):
+            break
+        directions = direction_indices(player.get_moves(current, valid))
+        if not valid[np.arange(len(live)), directions].all():
+            raise DirectionError
+        new_boards, points, _ = move_boards(current, directions)
+        boards[live] = new_boards
+        scores[live] += points
+        moves[live] += 1
+        winners = (new_boards >= winning_tile).any(axis=1)
+        won[live[winners]] = True
+        live = live[~winners]
+        new_numbers(boards, rng, live)
+    return scores, won, moves, boards
+
+
+def test_player(cls, iterations=100, width=4, seed=None):
+    """ Have a batch player play several games at once and return the
+    average score of these games. This is the batched counterpart of
+    eleven.test_player().
+
+    Args:
+        cls (BatchPlayer): a subclass of the BatchPlayer class.
+        iterations (int): the number of games to play at once.
+        width (int): the width of each board. Defaults to 4.
+        seed (int, optional): a seed for the random number generator.
+            Defaults to None.
+
+    Returns:
+        float: the average score over the games played.
+    """
+    assert issubclass(cls, BatchPlayer), \
+        "cls must be a subclass of BatchPlayer"
+    player = cls(np.random.default_rng(seed))
+    scores = play_batch(player, iterations, width)[0]
+    return scores.mean()
@@ -0,0 +1,250 @@
+"""Measure how fast the maze solvers in hw4.py run.
+
+"edits" toggles random inner cells of each maze file between wall and
+space, and compares repairing the path with an IncrementalSolver against
+solving again with solve_bfs after every edit. It prints one line per
+maze: the time of the first solve, then the mean time and cells expanded
+per edit for each solver.
+
+"scaling" generates square mazes of about 10 ** n characters for each
+exponent n and each kind of maze in generate.py, and solves every one
+with each strategy in hw4.STRATEGIES (all but "paths" by default). It
+prints one line per maze and strategy: the kind, the size of the file in
+bytes, the solve time, the peak memory traced by tracemalloc, and the
+cells expanded. IncrementalSolver is not one of the strategies; only
+"edits" measures it.
+
+Both take --seed, which seeds the edits or the generated mazes, and
+--output, which also writes the results to a JSON file along with the
+Python version, the platform, and the seed.
+
+Usage:
+    python benchmark.py edits large_maze.txt --edits 200
+    python benchmark.py scaling --max-exponent 8 --kinds perfect rooms
+    python benchmark.py scaling --seed 1 --output scaling.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import hw4
+from hw4 import Maze, IncrementalSolver, OPEN
+from generate import KINDS, cells_for_size, write_maze
+
+
+def random_edits(maze, count, seed):
+    """Chooses cells to toggle between wall and space. The outer rows and
+    columns, which hold the openings, are never chosen.
+
+    Arguments:
+        maze -- Maze -- The maze.
+        count -- int -- The number of edits.
+        seed -- int -- The seed for the random module.
+
+    Returns:
+        list -- Returns a list of (x, y) tuples.
+    """
+    rng = random.Random(seed)
+    return [(rng.randrange(1, maze.width - 1),
+             rng.randrange(1, maze.height - 1)) for i in range(count)]
+
+
+def bench_edits(path, edits=100, seed=0):
+    """Toggles random cells of a maze one at a time, repairing the path
+    with an IncrementalSolver and, for comparison, solving again from
+    scratch with a breadth-first search after every edit.
+
+    Arguments:
+        path -- str -- A path to a maze file.
+        edits -- int -- The number of cells to toggle.
+        seed -- int -- The seed for the random module.
+
+    Returns:
+        dict -- Returns the time of the first incremental solve and the
+        mean time and cells expanded per edit for both solvers, in
+        seconds.
+
+    Raises:
+        AssertionError -- If the two solvers disagree on the length of a
+        path.
+    """
+    maze = Maze(path)
+    solver = IncrementalSolver(maze)
+    start = time.perf_counter()
+    solver.solve()
+    initial = time.perf_counter() - start
+    incremental = full = 0.0
+    incremental_expanded = full_expanded = 0
+    cells = random_edits(maze, edits, seed)
+    for x, y in cells:
+        start = time.perf_counter()
+        if maze.grid[maze.index((x, y))] == OPEN:
+            repaired = solver.set_wall(x, y)
+        else:
+            repaired = solver.clear_wall(x, y)
+        incremental += time.perf_counter() - start
+        incremental_expanded += solver.expanded
+        start = time.perf_counter()
+        solved = maze.solve_bfs()
+        full += time.perf_counter() - start
+        full_expanded += maze.expanded
+        assert (repaired is None) == (solved is None) and \
+            (solved is None or len(repaired) == len(solved)), \
+            "incremental and full solutions differ"
+    return {"maze": path,
+            "cells": maze.width * maze.height,
+            "edits": edits,
+            "initial_seconds": initial,
+            "incremental_seconds": incremental / edits,
+            "full_seconds": full / edits,
+            "incremental_expanded": incremental_expanded / edits,
+            "full_expanded": full_expanded / edits}
+
+
+def measure(path, strategy):
+    """Solves a maze twice with one strategy: once to time it and once,
+    with tracemalloc running, to find its peak memory use. Each pass loads
+    the maze afresh and empties hw4.GRAPH_CACHE, so nothing is reused.
+
+    Arguments:
+        path -- str -- A path to a maze file.
+        strategy -- str -- One of hw4.STRATEGIES.
+
+    Returns:
+        dict -- Returns the solve time in seconds, the peak memory
+        allocated while solving in bytes, the cells (or nodes) expanded,
+        and the length of the path (None if there is none).
+    """
+    hw4.GRAPH_CACHE.clear()
+    maze = Maze(path)
+    start = time.perf_counter()
+    solution = maze.solve(strategy)
+    seconds = time.perf_counter() - start
+    expanded = getattr(maze, "expanded", None)
+    hw4.GRAPH_CACHE.clear()
+    maze = Maze(path)
+    tracemalloc.start()
+    try:
+        maze.solve(strategy)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    hw4.GRAPH_CACHE.clear()
+    return {"seconds": seconds,
+            "peak_bytes": peak,
+            "expanded": expanded,
+            "length": None if solution is None else len(solution)}
+
+
+def bench_scaling(exponents, kinds=KINDS, strategies=None, seed=0,
+                  directory=None):
+    """Generates mazes of 10 ** n characters for each exponent n and
+    kind of maze (see generate.py), and measures every strategy on each.
+    Mazes are written to directory and reused if they already exist.
+
+    Arguments:
+        exponents -- list -- The exponents of the maze sizes.
+        kinds -- list -- The kinds of maze (see generate.KINDS).
+        strategies -- list -- The strategies to measure. Defaults to every
+        strategy but "paths", which keeps a whole path per cell.
+        seed -- int -- The seed for the maze generator.
+        directory -- str -- Where to keep the generated mazes. Defaults
+        to the system's temporary directory.
+
+    Returns:
+        list -- Returns one dict per maze and strategy (see measure), each
+        also naming the maze, its kind and size, and the strategy.
+    """
+    if strategies is None:
+        strategies = [name for name in hw4.STRATEGIES if name != "paths"]
+    if directory is None:
+        directory = tempfile.gettempdir()
+    results = []
+    for exponent in exponents:
+        cells = cells_for_size(10 ** exponent)
+        for kind in kinds:
+            path = os.path.join(directory, "maze-{}-1e{}-{}.txt"
+                                .format(kind, exponent, seed))
+            if not os.path.exists(path):
+                write_maze(path, cells, cells, kind, seed)
+            for strategy in strategies:
+                result = {"maze": path, "kind": kind,
+                          "size": os.path.getsize(path),
+                          "strategy": strategy}
+                result.update(measure(path, strategy))
+                print("{kind:<8}{size:>12}  {strategy:<14}"
+                      "{seconds:>10.4f}s{peak_bytes:>14} B"
+                      "{expanded:>12} expanded".format(**result),
+                      flush=True)
+                results.append(result)
+    return results
+
+
+def main(args):
+    """Runs the benchmark named on the command line, prints its results,
+    and optionally writes them to a JSON file.
+
+    Arguments:
+        args -- list -- Command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # options that every command takes, after the command's name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--seed", type=int, default=0,
+                        help="seed for the edits or the generated mazes")
+    common.add_argument("--output", help="write results to this JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    edits = commands.add_parser(
+        "edits", parents=[common],
+        help="incremental repairs against full re-solves")
+    edits.add_argument("paths", nargs="+", help="maze files")
+    edits.add_argument("--edits", type=int, default=100,
+                       help="number of cells to toggle per maze")
+    scaling = commands.add_parser(
+        "scaling", parents=[common],
+        help="solvers on generated mazes of growing size")
+    scaling.add_argument("--min-exponent", type=int, default=2,
+                         help="smallest maze has 10 ** this many cells")
+    scaling.add_argument("--max-exponent", type=int, default=6,
+                         help="largest maze has 10 ** this many cells")
+    scaling.add_argument("--kinds", nargs="+", default=list(KINDS),
+                         choices=KINDS)
+    scaling.add_argument("--strategies", nargs="+", default=None,
+                         choices=hw4.STRATEGIES)
+    scaling.add_argument("--directory",
+                         help="where to keep generated mazes")
+    options = parser.parse_args(args)
+    if options.command == "scaling":
+        results = bench_scaling(
+            range(options.min_exponent, options.max_exponent + 1),
+            options.kinds, options.strategies, options.seed,
+            options.directory)
+    else:
+        results = []
+        for path in options.paths:
+            result = bench_edits(path, options.edits, options.seed)
+            print("{maze}: {cells} cells, first solve "
+                  "{initial_seconds:.4f}s, per edit "
+                  "{incremental_seconds:.6f}s incremental "
+                  "({incremental_expanded:.1f} expanded) vs "
+                  "{full_seconds:.6f}s full ({full_expanded:.1f} expanded)"
+                  .format(**result))
+            results.append(result)
+    if options.output:
+        report = {"python": platform.python_version(),
+                  "platform": platform.platform(),
+                  "seed": options.seed,
+                  "results": results}
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
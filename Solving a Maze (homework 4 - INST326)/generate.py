@@ -0,0 +1,147 @@
+"""Generate random mazes in the same text format as small_maze.txt.
+
+A maze of width by height cells is drawn on a grid of (2 * width + 1) by
+(2 * height + 1) characters: cells sit at odd coordinates, "+" marks the
+corners between them, and "-" and "|" are walls. There is one opening in
+the left column and one in the right column. The same seed always gives
+the same maze.
+
+Usage:
+    python generate.py maze.txt --width 100 --height 100 --kind loops
+"""
+
+import argparse
+import random
+import sys
+
+# the kinds of maze that generate() can make
+KINDS = ("perfect", "loops", "rooms")
+
+
+def generate(width, height, kind="perfect", seed=0, loops=0.1, rooms=None):
+    """Generates a maze with a randomized depth-first search, which makes
+    a perfect maze (exactly one path between any two cells), and then
+    optionally opens it up.
+
+    Arguments:
+        width -- int -- The number of cells across (at least 1).
+        height -- int -- The number of cells down (at least 1).
+        kind -- str -- "perfect"; "loops", which also removes the fraction
+        loops of the remaining inner walls; or "rooms", which also clears
+        rectangular rooms of up to a fifth of the maze across.
+        seed -- int -- The seed for the random number generator.
+        loops -- float -- The fraction of inner walls removed for "loops".
+        rooms -- int -- The number of rooms for "rooms". Defaults to one
+        per 400 cells (at least one).
+
+    Returns:
+        bytearray -- Returns the maze as text, with "\\n" after each row.
+
+    Raises:
+        ValueError -- If kind is not one of KINDS or the maze is empty.
+    """
+    if kind not in KINDS:
+        raise ValueError("unknown kind of maze: {!r} (expected one of {})"
+                         .format(kind, ", ".join(KINDS)))
+    if width < 1 or height < 1:
+        raise ValueError("a maze needs at least one cell")
+    rng = random.Random(seed)
+    columns = 2 * width + 1
+    stride = columns + 1
+    wall_row = b"+" + b"-+" * width + b"\n"
+    cell_row = b"|" + b" |" * width + b"\n"
+    grid = bytearray(wall_row + (cell_row + wall_row) * height)
+
+    def center(cell):
+        """Returns the index in grid of a cell numbered row by row."""
+        y, x = divmod(cell, width)
+        return (2 * y + 1) * stride + 2 * x + 1
+
+    # randomized depth-first search: knock down the wall to a random
+    # unvisited neighbour, backing up when there is none
+    visited = bytearray(width * height)
+    visited[0] = 1
+    stack = [0]
+    while stack:
+        cell = stack[-1]
+        x = cell % width
+        neighbours = []
+        if x > 0 and not visited[cell - 1]:
+            neighbours.append(cell - 1)
+        if x < width - 1 and not visited[cell + 1]:
+            neighbours.append(cell + 1)
+        if cell >= width and not visited[cell - width]:
+            neighbours.append(cell - width)
+        if cell + width < len(visited) and not visited[cell + width]:
+            neighbours.append(cell + width)
+        if not neighbours:
+            stack.pop()
+            continue
+        neighbour = neighbours[rng.randrange(len(neighbours))]
+        visited[neighbour] = 1
+        grid[(center(cell) + center(neighbour)) // 2] = ord(" ")
+        stack.append(neighbour)
+
+    if kind == "loops":
+        walls = [index for index in range(stride, len(grid) - stride)
+                 if grid[index] in b"-|" and
+                 0 < index % stride < columns - 1]
+        for index in rng.sample(walls, int(len(walls) * loops)):
+            grid[index] = ord(" ")
+    elif kind == "rooms":
+        if rooms is None:
+            rooms = max(1, width * height // 400)
+        for i in range(rooms):
+            w = rng.randint(1, max(1, width // 5))
+            h = rng.randint(1, max(1, height // 5))
+            x = rng.randrange(width - w + 1)
+            y = rng.randrange(height - h + 1)
+            for row in range(2 * y + 1, 2 * (y + h)):
+                start = row * stride + 2 * x + 1
+                grid[start:start + 2 * w - 1] = b" " * (2 * w - 1)
+
+    grid[(2 * rng.randrange(height) + 1) * stride] = ord(" ")
+    grid[(2 * rng.randrange(height) + 1) * stride + columns - 1] = ord(" ")
+    return grid
+
+
+def cells_for_size(size):
+    """Returns the width (and height) in cells of the square maze whose
+    text has roughly size characters."""
+    return max(1, round((size ** 0.5 - 1) / 2))
+
+
+def write_maze(path, width, height, kind="perfect", seed=0, **options):
+    """Generates a maze (see generate) and writes it to a file.
+
+    Arguments:
+        path -- str -- The path of the file to write.
+        width, height, kind, seed -- see generate.
+        options -- dict -- Other keyword arguments for generate.
+    """
+    with open(path, "wb") as f:
+        f.write(generate(width, height, kind, seed, **options))
+
+
+def main(args):
+    """Writes a maze to the file named on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="file to write")
+    parser.add_argument("--width", type=int, default=20,
+                        help="cells across")
+    parser.add_argument("--height", type=int, default=None,
+                        help="cells down (default: same as width)")
+    parser.add_argument("--kind", default="perfect", choices=KINDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loops", type=float, default=0.1,
+                        help="fraction of inner walls removed for loops")
+    parser.add_argument("--rooms", type=int, default=None,
+                        help="number of rooms for rooms")
+    options = parser.parse_args(args)
+    height = options.height if options.height is not None else options.width
+    write_maze(options.path, options.width, height, options.kind,
+               options.seed, loops=options.loops, rooms=options.rooms)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,61 +1,278 @@
 import sys
+import argparse
+import glob
+import heapq
+import json
+import mmap
+import os
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                as_completed, wait)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the character that can be walked through
+OPEN = ord(" ")
+# the cost of entering each kind of cell when solving with Dijkstra's
+# algorithm: 1 for a space and n for a digit n; other characters are walls
+COSTS = {OPEN: 1}
+COSTS.update((ord(str(n)), n) for n in range(1, 10))
+# the searches that solve() can use
+STRATEGIES = ("paths", "bfs", "astar", "bidirectional", "dijkstra",
+              "corridors", "wavefront")
+# corridor graphs built by Maze.compress, keyed by (file path, size,
+# modification time) so that reloading an unchanged file reuses its graph,
+# and by the layout of the grid, which differs between the text and memory
+# map loaders for the same file (e.g. with "\r\n" line endings); least
+# recently used first
+GRAPH_CACHE = OrderedDict()
+# the number of graphs GRAPH_CACHE keeps before it starts dropping the least
+# recently used ones (each worker process of solve_many has its own cache)
+GRAPH_CACHE_SIZE = 16
+# the default number of bytes of distance fields (see Maze.field) that a
+# maze keeps before it starts dropping the least recently used ones
+FIELD_BUDGET = 64 * 1024 * 1024
+
+
+class Rows:
+    """A read-only, list-like view of the rows of a memory-mapped maze.
+    Each row is decoded into a string only when it is accessed.
+    """
+
+    def __init__(self, grid, width, height, stride):
+        self.grid = grid
+        self.width = width
+        self.height = height
+        self.stride = stride
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("row out of range")
+        start = y * self.stride
+        return self.grid[start:start + self.width].decode("utf-8")
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+
 class Maze:
 
-    def __init__(self, path):
-        self.load(path)
+    def __init__(self, path, use_mmap=False):
+        self.load(path, use_mmap)
 
-    def load(self, path):
+    def load(self, path, use_mmap=False):
         """
         Opens specified file for reading and converts the contents of the file into a list of strings and stores these in the object's maze attribute.
 
+        The maze is also stored as a flat grid of bytes (the object's grid
+        attribute) in which row y starts at index y * stride; the bytes
+        between the end of one row and the start of the next are line
+        endings, which count as walls.
+
         Arguments:
             path -- str -- A path to a plain text file in UTF-8 encoding containing a maze.
+            use_mmap -- bool -- If True, memory-map the file and use it as
+            the grid without reading it into memory; every row of the file
+            must then have the same length. The maze attribute becomes a
+            read-only view that decodes rows as they are accessed.
         """
-        f = open(path, 'r', encoding='utf-8')
-        self.maze = []
-        for line in f.readlines():
-            line = line.rstrip('\n')
-            self.maze.append(line)
+        self.path = path
+        self.graph = None
+        self.edited = False
+        self.fields = OrderedDict()
+        self.field_budget = FIELD_BUDGET
+        if use_mmap:
+            self._load_mmap(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.maze = []
+                for line in f:
+                    line = line.rstrip('\r\n')
+                    if line:
+                        self.maze.append(line)
+            self.height = len(self.maze)
+            self.width = max(len(row) for row in self.maze)
+            self.stride = self.width + 1
+            self.grid = "".join(row.ljust(self.width, "#") + "\n"
+                                for row in self.maze).encode("utf-8")
         self.start = self.find_opening(0)
         self.end = self.find_opening(-1)
 
+    def _load_mmap(self, path):
+        """Memory-maps a maze file and works out its row stride from the
+        position of the first line ending.
+
+        Arguments:
+            path -- str -- A path to a maze file whose rows all have the
+            same length.
+        """
+        with open(path, 'rb') as f:
+            self.grid = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self.grid)
+        newline = self.grid.find(b"\n")
+        if newline == -1:
+            self.width = self.stride = size
+        else:
+            self.stride = newline + 1
+            self.width = newline
+            if newline and self.grid[newline - 1] == ord("\r"):
+                self.width -= 1
+        # the last row may or may not end with a line ending
+        self.height = (size + self.stride - self.width) // self.stride
+        self.maze = Rows(self.grid, self.width, self.height, self.stride)
+
+    def close(self):
+        """Releases the memory map of a maze loaded with use_mmap."""
+        if isinstance(self.grid, mmap.mmap):
+            self.grid.close()
+
+    def set_wall(self, x, y):
+        """Turns a cell into a wall (see set_cell)."""
+        self.set_cell(x, y, "#")
+
+    def clear_wall(self, x, y):
+        """Turns a cell into a space (see set_cell)."""
+        self.set_cell(x, y, " ")
+
+    def set_cell(self, x, y, char):
+        """Changes one cell of the maze. The first edit copies the grid
+        attribute into a bytearray (for a memory-mapped maze, the file
+        itself is never written to). Cached corridor graphs and distance
+        fields are dropped, but the start and end are not searched for
+        again.
+
+        Arguments:
+            x -- int -- The column of the cell.
+            y -- int -- The row of the cell.
+            char -- str -- The new contents of the cell: a space, a digit
+            (see COSTS), or any other character for a wall.
+
+        Raises:
+            IndexError -- If (x, y) is outside the maze.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("cell out of range: {}".format((x, y)))
+        if not isinstance(self.grid, bytearray):
+            grid = bytearray(self.grid)
+            self.close()
+            self.grid = grid
+            if isinstance(self.maze, Rows):
+                self.maze = Rows(grid, self.width, self.height, self.stride)
+        self.grid[self.index((x, y))] = ord(char)
+        if not isinstance(self.maze, Rows):
+            row = self.maze[y].ljust(self.width, "#")
+            self.maze[y] = row[:x] + char + row[x + 1:]
+        self.edited = True
+        self.graph = None
+        self.fields.clear()
+
+    def cells(self):
+        """Returns a (height, width) NumPy array of the bytes of the maze
+        that shares memory with the grid attribute, skipping line endings.
+        Requires NumPy."""
+        return np.lib.stride_tricks.as_strided(
+            np.frombuffer(self.grid, dtype=np.uint8),
+            shape=(self.height, self.width), strides=(self.stride, 1))
+
+    def passable(self):
+        """Packs the maze into one bit per cell, row after row (without
+        line endings): 1 for a space and 0 for a wall.
+
+        Returns:
+            bytes -- Returns ceil(width * height / 8) bytes; the bit for
+            cell (x, y) is bit (i % 8) of byte i // 8 (least significant
+            first), where i = y * width + x.
+        """
+        if np is not None:
+            return np.packbits(self.cells() == OPEN,
+                               bitorder="little").tobytes()
+        bits = bytearray((self.width * self.height + 7) // 8)
+        i = 0
+        for y in range(self.height):
+            row = self.grid[y * self.stride:y * self.stride + self.width]
+            for cell in row:
+                if cell == OPEN:
+                    bits[i >> 3] |= 1 << (i & 7)
+                i += 1
+        return bytes(bits)
+
     def find_opening(self, pos):
-        """Iterates over the strings in the object's maze attribute until it finds a string where the character at the specified position (0 or -1) is a space character.
+        """Iterates over the rows of the maze until it finds one where the character at the specified position (0 or -1) is a space character, looking only at that character of each row.
 
         Arguments:
-            pos -- int -- The position to at which to look for an opening. Should be 0 (start of the string) or -1 (end of the string).
+            pos -- int -- The position to at which to look for an opening. Should be 0 (start of the string) or -1 (end of the string). For -1, the last character of each row is used, so a row that is shorter than the others can hold the opening.
 
         Returns:
             [tuple (int, int)] -- [returns start/end coordinates of object's maze attribute.]
         """
-        if pos == 0:
-            for y, x in enumerate(self.maze):
-                if x[0] == ' ':
-                    start = (0, y)
-                    return start
-        elif pos == -1:
-            for y, x in enumerate(self.maze):
-                if x[-1] == ' ':
-                    end = ((len(x)-1), y)
-                    return end
+        for y in range(self.height):
+            if pos == 0:
+                x = 0
+            elif isinstance(self.maze, Rows):
+                x = self.width - 1
+            else:
+                # rows of a text maze can be shorter than width
+                x = len(self.maze[y]) - 1
+            if self.grid[y * self.stride + x] == OPEN:
+                return (x, y)
 
-    def solve(self):
+    def solve(self, strategy="paths"):
         """Finds a path of (x, y) coordinates through the maze specified in the
         object's maze attribute, where each x coordinate represents an index in
         a string and each y coordinate represents an index
-        in the list of strings.
+        in the list of strings. The number of cells the search expanded is
+        stored in the object's expanded attribute.
+
+        Arguments:
+            strategy -- str -- The search to use: "paths" (keep a list of
+            paths; see solve_paths), "bfs", "astar", "bidirectional",
+            "dijkstra", "corridors", or "wavefront" (see the solve_* method
+            of the same name).
 
         Returns:
             list -- Returns a list of tuples that act as the coordinates of
-            the fastest path needed to reach the end of the maze.
+            the fastest path needed to reach the end of the maze, or None if
+            there is no path (or the maze has no start or no end).
+
+        Raises:
+            ValueError -- The strategy is not one of the above.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError("unknown strategy: {}".format(strategy))
+        if self.start is None or self.end is None:
+            self.expanded = 0
+            return None
+        return getattr(self, "solve_" + strategy)()
+
+    def solve_paths(self):
+        """Finds a path through the maze by keeping a list of the paths
+        being explored, as described in the assignment.
+
+        Returns:
+            list -- Returns a list of tuples that act as the coordinates of
+            the fastest path needed to reach the end of the maze, or None if
+            there is none.
         """
         start = self.start
         end = self.end
         visited = [start]
         exploring = [visited.copy()]
-        while 1 == 1:
+        self.expanded = 0
+        while exploring:
             current_path = exploring.pop()
             current_cord = current_path[-1]
+            self.expanded += 1
             if current_cord == end:
                 return current_path
             (w, z) = current_cord
@@ -83,10 +300,1001 @@ class Maze:
                 new_path = current_path.copy()
                 new_path.append(new_cord)
                 exploring.append(new_path)
+        return None
+
+    def steps(self):
+        """Returns the offsets that move from a cell of the grid attribute
+        to its right, left, lower, and upper neighbours. A search records
+        how it reached each cell as the index of the step plus one, so
+        that 0 means "not visited".
+        """
+        return (1, -1, self.stride, -self.stride)
+
+    def index(self, coord):
+        """Converts (x, y) coordinates to an index into the grid
+        attribute."""
+        return coord[1] * self.stride + coord[0]
+
+    def coord(self, index):
+        """Converts an index into the grid attribute to (x, y)
+        coordinates."""
+        y, x = divmod(index, self.stride)
+        return (x, y)
+
+    def solve_bfs(self):
+        """Finds the shortest path through the maze with a breadth-first
+        search that stores, for each cell, only which neighbour it was
+        reached from (in a flat bytearray that doubles as the visited
+        set). The path is rebuilt once, when the end is reached, so the
+        search uses O(cells) memory instead of storing a path per cell.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path.
+        """
+        grid = self.grid
+        size = len(grid)
+        start = self.index(self.start)
+        end = self.index(self.end)
+        steps = list(enumerate(self.steps(), 1))
+        parent = bytearray(size)
+        parent[start] = 1
+        queue = deque([start])
+        expanded = 0
+        while queue:
+            cell = queue.popleft()
+            expanded += 1
+            if cell == end:
+                self.expanded = expanded
+                return self.trace(parent, end)
+            for code, step in steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and not parent[neighbour] and \
+                        grid[neighbour] == OPEN:
+                    parent[neighbour] = code
+                    queue.append(neighbour)
+        self.expanded = expanded
+        return None
+
+    def trace(self, parent, end, start=None):
+        """Rebuilds a path by following the steps recorded in parent (see
+        steps()) back from end to the start.
+
+        Arguments:
+            parent -- bytearray -- The step that reached each cell, as
+            filled in by a search.
+            end -- int -- The index of the last cell in the grid
+            attribute.
+            start -- int -- The index of the cell the search started from.
+            Defaults to the start of the maze.
+
+        Returns:
+            list -- Returns the path as a list of (x, y) tuples.
+        """
+        steps = self.steps()
+        if start is None:
+            start = self.index(self.start)
+        cell = end
+        path = [cell]
+        while cell != start:
+            cell -= steps[parent[cell] - 1]
+            path.append(cell)
+        path.reverse()
+        return [self.coord(cell) for cell in path]
+
+    def solve_astar(self):
+        """Finds the shortest path through the maze with A* search, using
+        the Manhattan distance to the end as the heuristic. On open mazes
+        this expands far fewer cells than a breadth-first search.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path.
+        """
+        grid = self.grid
+        size = len(grid)
+        stride = self.stride
+        start = self.index(self.start)
+        end = self.index(self.end)
+        ex, ey = self.end
+        steps = list(enumerate(self.steps(), 1))
+        parent = bytearray(size)
+        parent[start] = 1
+        cost = {start: 0}
+        closed = bytearray(size)
+        # ties are broken in favour of the cell farthest from the start
+        heap = [(abs(self.start[0] - ex) + abs(self.start[1] - ey), 0,
+                 start)]
+        expanded = 0
+        while heap:
+            f, g, cell = heapq.heappop(heap)
+            g = -g
+            if closed[cell]:
+                continue
+            closed[cell] = 1
+            expanded += 1
+            if cell == end:
+                self.expanded = expanded
+                return self.trace(parent, end)
+            for code, step in steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and grid[neighbour] == OPEN and \
+                        not closed[neighbour] and \
+                        g + 1 < cost.get(neighbour, size):
+                    cost[neighbour] = g + 1
+                    parent[neighbour] = code
+                    y, x = divmod(neighbour, stride)
+                    h = abs(x - ex) + abs(y - ey)
+                    heapq.heappush(heap, (g + 1 + h, -(g + 1), neighbour))
+        self.expanded = expanded
+        return None
+
+    def solve_bidirectional(self):
+        """Finds the shortest path through the maze with two breadth-first
+        searches, one from the start and one from the end, that take turns
+        expanding a whole layer (always the smaller one) until they meet.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path.
+        """
+        grid = self.grid
+        size = len(grid)
+        start = self.index(self.start)
+        end = self.index(self.end)
+        steps = list(enumerate(self.steps(), 1))
+        forward = bytearray(size)
+        backward = bytearray(size)
+        forward[start] = 1
+        backward[end] = 1
+        frontiers = [[start], [end]]
+        parents = [forward, backward]
+        meet = start if start == end else None
+        expanded = 0
+        while meet is None and frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            parent, other = parents[side], parents[1 - side]
+            layer = []
+            for cell in frontiers[side]:
+                expanded += 1
+                for code, step in steps:
+                    neighbour = cell + step
+                    if 0 <= neighbour < size and not parent[neighbour] \
+                            and grid[neighbour] == OPEN:
+                        parent[neighbour] = code
+                        if other[neighbour]:
+                            meet = neighbour
+                            break
+                        layer.append(neighbour)
+                if meet is not None:
+                    break
+            frontiers[side] = layer
+        self.expanded = expanded
+        if meet is None:
+            return None
+        path = self.trace(forward, meet)
+        offsets = self.steps()
+        cell = meet
+        while cell != end:
+            cell -= offsets[backward[cell] - 1]
+            path.append(self.coord(cell))
+        return path
+
+    def solve_dijkstra(self):
+        """Finds the cheapest path through a maze whose cells have costs:
+        entering a space costs 1 and entering a digit n costs n (see
+        COSTS). All other characters are walls.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path. The cost of the
+            path is stored in the object's cost attribute.
+        """
+        grid = self.grid
+        size = len(grid)
+        start = self.index(self.start)
+        end = self.index(self.end)
+        steps = list(enumerate(self.steps(), 1))
+        parent = bytearray(size)
+        parent[start] = 1
+        dist = {start: 0}
+        closed = bytearray(size)
+        heap = [(0, start)]
+        expanded = 0
+        while heap:
+            d, cell = heapq.heappop(heap)
+            if closed[cell]:
+                continue
+            closed[cell] = 1
+            expanded += 1
+            if cell == end:
+                self.expanded = expanded
+                self.cost = d
+                return self.trace(parent, end)
+            for code, step in steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and not closed[neighbour]:
+                    weight = COSTS.get(grid[neighbour])
+                    if weight is not None and \
+                            d + weight < dist.get(neighbour, d + weight + 1):
+                        dist[neighbour] = d + weight
+                        parent[neighbour] = code
+                        heapq.heappush(heap, (d + weight, neighbour))
+        self.expanded = expanded
+        self.cost = None
+        return None
+
+    def solve_wavefront(self):
+        """Finds the shortest path through the maze with a breadth-first
+        search that advances the whole frontier one layer at a time with
+        NumPy: every frontier cell is shifted by each of the four steps at
+        once, the results are masked to open, unvisited cells, and those
+        cells are labelled with the layer number. The path is then walked
+        back from the end through decreasing layers. The frontier is kept
+        as an array of cell indices rather than a full boolean grid, so a
+        layer costs time in proportion to the frontier, not the maze.
+        Without NumPy this falls back to solve_bfs.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path.
+        """
+        if np is None:
+            return self.solve_bfs()
+        # pad with a border of walls so that no step leaves the array
+        stride = self.width + 2
+        free = np.zeros((self.height + 2, stride), dtype=bool)
+        free[1:-1, 1:-1] = self.cells() == OPEN
+        free = free.ravel()
+        dist = np.full(free.shape, -1, dtype=np.int32)
+        # the position of each cell in the latest layer, used to drop
+        # cells reached from more than one frontier cell
+        owner = np.zeros(free.shape, dtype=np.intp)
+        steps = np.array([1, -1, stride, -stride])
+        start = (self.start[1] + 1) * stride + self.start[0] + 1
+        end = (self.end[1] + 1) * stride + self.end[0] + 1
+        dist[start] = 0
+        frontier = np.array([start])
+        layer = 0
+        expanded = 0
+        while len(frontier) and dist[end] < 0:
+            expanded += len(frontier)
+            reached = (frontier[:, None] + steps).ravel()
+            reached = reached[free[reached] & (dist[reached] < 0)]
+            layer += 1
+            dist[reached] = layer
+            order = np.arange(len(reached))
+            owner[reached] = order
+            frontier = reached[owner[reached] == order]
+        self.expanded = expanded
+        if dist[end] < 0:
+            return None
+        cell = end
+        path = [cell]
+        for d in range(layer - 1, -1, -1):
+            for step in (1, -1, stride, -stride):
+                if dist[cell + step] == d:
+                    cell += step
+                    break
+            path.append(cell)
+        path.reverse()
+        return [(cell % stride - 1, cell // stride - 1) for cell in path]
+
+    def field(self, source):
+        """Returns the distance field of a source cell, computing it with
+        one breadth-first search the first time it is asked for. Fields
+        are kept in the object's fields attribute, most recently used
+        last, and the least recently used ones are dropped once they take
+        up more than field_budget bytes.
+
+        Arguments:
+            source -- tuple -- The (x, y) coordinates of an open cell.
+
+        Returns:
+            DistanceField -- Returns the field.
+
+        Raises:
+            ValueError -- If source is a wall or outside the maze.
+        """
+        source = tuple(source)
+        fields = self.fields
+        field = fields.get(source)
+        if field is not None:
+            fields.move_to_end(source)
+            return field
+        x, y = source
+        if not (0 <= x < self.width and 0 <= y < self.height) or \
+                self.grid[self.index(source)] != OPEN:
+            raise ValueError("not an open cell: {}".format(source))
+        field = DistanceField(self, source)
+        if field.nbytes <= self.field_budget:
+            fields[source] = field
+            used = sum(f.nbytes for f in fields.values())
+            while used > self.field_budget:
+                used -= fields.popitem(last=False)[1].nbytes
+        return field
+
+    def route(self, source, target):
+        """Finds a shortest path between any two cells, reusing the
+        distance field of source if it has been computed before (see
+        field), so that repeated queries from the same source cost only
+        the length of the path.
+
+        Arguments:
+            source -- tuple -- The (x, y) coordinates of the first cell.
+            target -- tuple -- The (x, y) coordinates of the last cell.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from source to target,
+            or None if target cannot be reached.
+        """
+        return self.field(source).path(target)
+
+    def compress(self):
+        """Builds (or fetches from GRAPH_CACHE) the corridor graph of the
+        maze: dead ends are filled in, and every remaining run of cells
+        with exactly two open neighbours becomes a single weighted edge
+        between the junctions at its ends. Graphs of mazes changed with
+        set_cell are not shared through GRAPH_CACHE, which keeps at most
+        GRAPH_CACHE_SIZE graphs.
+
+        Returns:
+            CorridorGraph -- Returns the graph, which is also stored in the
+            object's graph attribute.
+        """
+        if self.graph is None and self.edited:
+            self.graph = CorridorGraph(self)
+        elif self.graph is None:
+            stat = os.stat(self.path)
+            key = (os.path.abspath(self.path), stat.st_size,
+                   stat.st_mtime_ns, self.stride, self.height, self.start,
+                   self.end)
+            self.graph = GRAPH_CACHE.get(key)
+            if self.graph is not None:
+                GRAPH_CACHE.move_to_end(key)
+            else:
+                self.graph = CorridorGraph(self)
+                GRAPH_CACHE[key] = self.graph
+                while len(GRAPH_CACHE) > GRAPH_CACHE_SIZE:
+                    GRAPH_CACHE.popitem(last=False)
+        return self.graph
+
+    def solve_corridors(self):
+        """Finds the shortest path through the maze by running Dijkstra's
+        algorithm on the corridor graph (see compress) and expanding the
+        corridors on the chosen route back into cells. Building the graph
+        costs more than one BFS, so this pays off for mazes with long
+        corridors that are solved more than once; open areas, where every
+        cell is a junction, do not compress.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path. The object's
+            expanded attribute counts graph nodes, not cells.
+        """
+        graph = self.compress()
+        start = self.index(self.start)
+        end = self.index(self.end)
+        route = graph.route(start, end)
+        self.expanded = graph.expanded
+        if route is None:
+            return None
+        path = [start]
+        for node, code in route:
+            path.extend(graph.corridor(node, code))
+        return [self.coord(cell) for cell in path]
+
+
+class CorridorGraph:
+    """The junctions of a maze and the corridors between them.
+
+    Attributes:
+        steps -- tuple -- The maze's neighbour offsets (see Maze.steps).
+        live -- bytearray -- 1 for each open cell of the maze's grid that
+        is not part of a filled dead end.
+        edges -- dict -- For each node (a grid index), a list of
+        (neighbour node, corridor length, step code) tuples, where the step
+        code is the index in steps of the first step into the corridor.
+        expanded -- int -- The number of nodes expanded by the last call
+        to route.
+    """
+
+    def __init__(self, maze):
+        """Fills the dead ends of a maze and finds its corridors.
+
+        Arguments:
+            maze -- Maze -- The maze to compress.
+        """
+        grid = maze.grid
+        size = len(grid)
+        self.steps = maze.steps()
+        keep = {maze.index(maze.start), maze.index(maze.end)}
+        live = bytearray(size)
+        for cell in range(size):
+            if grid[cell] == OPEN:
+                live[cell] = 1
+        self.live = live
+        # fill dead ends: repeatedly remove open cells with at most one
+        # open neighbour
+        queue = deque(cell for cell in range(size)
+                      if live[cell] and self.degree(cell) <= 1)
+        while queue:
+            cell = queue.popleft()
+            if not live[cell] or cell in keep or self.degree(cell) > 1:
+                continue
+            live[cell] = 0
+            for step in self.steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and live[neighbour]:
+                    queue.append(neighbour)
+        nodes = [cell for cell in range(size) if live[cell] and
+                 (cell in keep or self.degree(cell) != 2)]
+        self.nodes = set(nodes)
+        self.edges = {}
+        for node in nodes:
+            edges = self.edges[node] = []
+            for code, step in enumerate(self.steps):
+                neighbour = node + step
+                if 0 <= neighbour < size and live[neighbour]:
+                    cells = self.corridor(node, code)
+                    if cells[-1] != node:
+                        edges.append((cells[-1], len(cells), code))
+        self.expanded = 0
+
+    def degree(self, cell):
+        """Returns the number of live neighbours of a grid index."""
+        live = self.live
+        size = len(live)
+        count = 0
+        for step in self.steps:
+            neighbour = cell + step
+            if 0 <= neighbour < size and live[neighbour]:
+                count += 1
+        return count
+
+    def corridor(self, node, code):
+        """Walks from a node along a corridor to the node at its other end.
+
+        Arguments:
+            node -- int -- The grid index of the node.
+            code -- int -- The index in steps of the first step.
+
+        Returns:
+            list -- Returns the grid indices of the cells walked through,
+            ending with the node at the other end.
+        """
+        live = self.live
+        size = len(live)
+        previous, cell = node, node + self.steps[code]
+        cells = [cell]
+        while cell not in self.nodes:
+            for step in self.steps:
+                neighbour = cell + step
+                if neighbour != previous and 0 <= neighbour < size and \
+                        live[neighbour]:
+                    previous, cell = cell, neighbour
+                    break
+            else:
+                break
+            cells.append(cell)
+        return cells
+
+    def route(self, start, end):
+        """Finds the shortest route between two nodes with Dijkstra's
+        algorithm.
+
+        Arguments:
+            start -- int -- The grid index of the first node.
+            end -- int -- The grid index of the last node.
+
+        Returns:
+            list -- Returns the route as a list of (node, step code) pairs,
+            one per corridor taken, or None if there is no route.
+        """
+        dist = {start: 0}
+        came_from = {}
+        heap = [(0, start)]
+        done = set()
+        self.expanded = 0
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            self.expanded += 1
+            if node == end:
+                route = []
+                while node != start:
+                    node, code = came_from[node]
+                    route.append((node, code))
+                route.reverse()
+                return route
+            for neighbour, length, code in self.edges.get(node, ()):
+                if d + length < dist.get(neighbour, d + length + 1):
+                    dist[neighbour] = d + length
+                    came_from[neighbour] = (node, code)
+                    heapq.heappush(heap, (d + length, neighbour))
+        return None
+
+
+class DistanceField:
+    """The breadth-first distances from one cell of a maze to every other
+    cell, and the step that reached each of them.
+
+    Attributes:
+        source -- tuple -- The (x, y) coordinates of the source cell.
+        dist -- array -- The distance of each cell of the maze's grid from
+        the source, or -1 if the cell cannot be reached.
+        parent -- bytearray -- The step that reached each cell (see
+        Maze.steps).
+        nbytes -- int -- The memory used by dist and parent.
+        expanded -- int -- The number of cells expanded to build the
+        field.
+    """
+
+    def __init__(self, maze, source):
+        """Runs a breadth-first search over the whole maze from a source
+        cell.
+
+        Arguments:
+            maze -- Maze -- The maze.
+            source -- tuple -- The (x, y) coordinates of an open cell.
+        """
+        self.maze = maze
+        self.source = source
+        grid = maze.grid
+        size = len(grid)
+        start = maze.index(source)
+        steps = list(enumerate(maze.steps(), 1))
+        dist = array("i", [-1]) * size
+        parent = bytearray(size)
+        dist[start] = 0
+        parent[start] = 1
+        queue = deque([start])
+        expanded = 0
+        while queue:
+            cell = queue.popleft()
+            expanded += 1
+            d = dist[cell] + 1
+            for code, step in steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and not parent[neighbour] and \
+                        grid[neighbour] == OPEN:
+                    parent[neighbour] = code
+                    dist[neighbour] = d
+                    queue.append(neighbour)
+        self.dist = dist
+        self.parent = parent
+        self.nbytes = dist.itemsize * len(dist) + len(parent)
+        self.expanded = expanded
+
+    def distance(self, target):
+        """Returns the length of the shortest path from the source to the
+        (x, y) coordinates in target, or -1 if there is none."""
+        x, y = target
+        if not (0 <= x < self.maze.width and 0 <= y < self.maze.height):
+            return -1
+        return self.dist[self.maze.index(target)]
+
+    def path(self, target):
+        """Rebuilds the shortest path from the source to a cell.
+
+        Arguments:
+            target -- tuple -- The (x, y) coordinates of the last cell.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the source to
+            target, or None if target cannot be reached.
+        """
+        if self.distance(target) < 0:
+            return None
+        maze = self.maze
+        return maze.trace(self.parent, maze.index(target),
+                          maze.index(self.source))
+
+
+class IncrementalSolver:
+    """Keeps the shortest path between the start and end of a maze up to
+    date as cells are opened and closed, using Lifelong Planning A*: the
+    search keeps the distance of every cell it has settled from the
+    start, and after an edit only the cells whose distance changes are
+    searched again.
+
+    Some edits change the distances of a large part of the maze, such as
+    a wall across the only corridor to a big region. Repairing those one
+    cell at a time costs more than starting over, so a repair that
+    expands more than 1 / FALLBACK of the cells the last full search
+    reached is abandoned, and the maze is solved again from scratch with
+    one breadth-first search (see reset).
+
+    Attributes:
+        maze -- Maze -- The maze, which should only be edited through
+        set_wall and clear_wall while the solver is in use.
+        g -- array -- The settled distance of each cell of the maze's grid
+        from the start (INFINITY if unknown or unreachable).
+        rhs -- array -- The distance of each cell according to its
+        neighbours' settled distances.
+        limit -- int -- The number of cells a repair may expand before it
+        falls back to a full search (None until the first solve).
+        solution -- list -- The last shortest path found (None if there
+        is none), which is reused while no cell's distance changes.
+        expanded -- int -- The number of cells expanded by the last call
+        to solve, set_wall, or clear_wall.
+    """
+
+    INFINITY = 2 ** 31 - 1
+    FALLBACK = 16
+
+    def __init__(self, maze):
+        """Prepares to solve a maze; no search is done until solve is
+        called.
+
+        Arguments:
+            maze -- Maze -- The maze.
+        """
+        self.maze = maze
+        size = len(maze.grid)
+        self.steps = maze.steps()
+        self.start = maze.index(maze.start)
+        self.end = maze.index(maze.end)
+        self.g = array("i", [self.INFINITY]) * size
+        self.rhs = array("i", [self.INFINITY]) * size
+        self.heap = []
+        self.limit = None
+        self.expanded = 0
+        self.solution = None
+
+    def key(self, cell):
+        """Returns the priority of a cell: its best known distance plus
+        the Manhattan distance to the end, then the distance itself."""
+        d = min(self.g[cell], self.rhs[cell])
+        if d == self.INFINITY:
+            return (d, d)
+        y, x = divmod(cell, self.maze.stride)
+        ey, ex = divmod(self.end, self.maze.stride)
+        return (d + abs(x - ex) + abs(y - ey), d)
+
+    def update(self, cell):
+        """Recomputes the rhs value of a cell from its neighbours (0 for the
+        start, unless it has been walled in) and queues the cell if it no
+        longer agrees with its g value."""
+        grid = self.maze.grid
+        size = len(grid)
+        best = self.INFINITY
+        if grid[cell] != OPEN:
+            pass
+        elif cell == self.start:
+            best = 0
+        else:
+            g = self.g
+            for step in self.steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and g[neighbour] < best and \
+                        grid[neighbour] == OPEN:
+                    best = g[neighbour]
+            if best != self.INFINITY:
+                best += 1
+        self.rhs[cell] = best
+        if self.g[cell] != best:
+            heapq.heappush(self.heap, (self.key(cell), cell))
+
+    def reset(self):
+        """Solves the maze from scratch with a breadth-first search from
+        the start that stops once the end is reached, like solve_bfs. The
+        cells it expanded are settled; the cells it found but did not
+        expand are queued, so that later searches can carry on from them.
+        limit is set from the number of cells expanded, and the path is
+        traced from the steps the search took (see Maze.trace) into the
+        solution attribute."""
+        maze = self.maze
+        grid = maze.grid
+        size = len(grid)
+        steps = list(enumerate(self.steps, 1))
+        start, end = self.start, self.end
+        infinity = self.INFINITY
+        g = array("i", [infinity]) * size
+        parent = bytearray(size)
+        expanded = 0
+        queue = deque()
+        self.solution = None
+        if grid[start] == OPEN:
+            g[start] = 0
+            queue.append(start)
+        while queue:
+            cell = queue.popleft()
+            expanded += 1
+            if cell == end:
+                self.solution = maze.trace(parent, end, start)
+                break
+            d = g[cell] + 1
+            for code, step in steps:
+                neighbour = cell + step
+                if 0 <= neighbour < size and g[neighbour] == infinity and \
+                        grid[neighbour] == OPEN:
+                    g[neighbour] = d
+                    parent[neighbour] = code
+                    queue.append(neighbour)
+        # the cells left in the queue were found but not expanded
+        self.rhs = array("i", g)
+        self.heap = []
+        for cell in queue:
+            g[cell] = infinity
+            self.heap.append((self.key(cell), cell))
+        heapq.heapify(self.heap)
+        self.g = g
+        self.limit = expanded // self.FALLBACK
+        self.expanded += expanded
+
+    def search(self):
+        """Expands queued cells until the distance of the end is settled,
+        or falls back to reset once more than limit cells have been
+        expanded. Queue entries whose key is out of date are skipped:
+        every cell whose g and rhs disagree has an entry with its current
+        key.
+
+        When a cell's distance goes down, only its neighbours' rhs values
+        can go down with it, so they are lowered directly. When it goes
+        up, only the neighbours whose rhs came from it are recomputed.
+
+        Returns:
+            bool -- Returns True if the search fell back to reset.
+        """
+        g, rhs, heap = self.g, self.rhs, self.heap
+        grid = self.maze.grid
+        size = len(grid)
+        steps = self.steps
+        start, end = self.start, self.end
+        stride = self.maze.stride
+        ey, ex = divmod(end, stride)
+        infinity = self.INFINITY
+        limit = self.limit
+        push, pop = heapq.heappush, heapq.heappop
+        expanded = 0
+        while heap:
+            # the end's heuristic is 0, so its key is (d, d)
+            d = min(g[end], rhs[end])
+            if heap[0][0] >= (d, d) and g[end] == rhs[end]:
+                break
+            key, cell = pop(heap)
+            old, best = g[cell], rhs[cell]
+            if old == best:
+                continue
+            d = min(old, best)
+            y, x = divmod(cell, stride)
+            if key != (d + abs(x - ex) + abs(y - ey), d):
+                continue
+            expanded += 1
+            if expanded > limit:
+                self.expanded = expanded
+                self.reset()
+                return True
+            if old > best:
+                # lowered: each open neighbour can now be one step further
+                g[cell] = best
+                d = best + 1
+                for step in steps:
+                    neighbour = cell + step
+                    if 0 <= neighbour < size and rhs[neighbour] > d and \
+                            neighbour != start and grid[neighbour] == OPEN:
+                        rhs[neighbour] = d
+                        if g[neighbour] != d:
+                            y, x = divmod(neighbour, stride)
+                            push(heap, ((d + abs(x - ex) + abs(y - ey), d),
+                                        neighbour))
+            else:
+                # raised: recompute the cell and the neighbours that went
+                # through it
+                g[cell] = infinity
+                self.update(cell)
+                d = old + 1
+                for step in steps:
+                    neighbour = cell + step
+                    if 0 <= neighbour < size and rhs[neighbour] == d:
+                        self.update(neighbour)
+        self.expanded = expanded
+        return False
+
+    def path(self):
+        """Rebuilds the shortest path by walking back from the end to the
+        start, always to a neighbour one step closer to the start.
+
+        Returns:
+            list -- Returns a list of (x, y) tuples from the start to the
+            end of the maze, or None if there is no path.
+        """
+        g = self.g
+        grid = self.maze.grid
+        size = len(grid)
+        steps = self.steps
+        start = self.start
+        cell = self.end
+        if g[cell] == self.INFINITY or grid[cell] != OPEN or \
+                grid[start] != OPEN:
+            return None
+        path = [cell]
+        while cell != start:
+            d = g[cell] - 1
+            for step in steps:
+                neighbour = cell - step
+                if 0 <= neighbour < size and g[neighbour] == d \
+                        and grid[neighbour] == OPEN:
+                    cell = neighbour
+                    break
+            path.append(cell)
+        path.reverse()
+        stride = self.maze.stride
+        return [(cell % stride, cell // stride) for cell in path]
+
+    def solve(self):
+        """Brings the search up to date and returns the shortest path (see
+        path). The first call solves the maze from scratch (see reset). If
+        no cell had to be expanded, no distance changed, so the last path
+        is still a shortest path and is returned again (as a new list)."""
+        if self.limit is None:
+            self.expanded = 0
+            self.reset()
+        elif not self.search() and self.expanded:
+            self.solution = self.path()
+        return None if self.solution is None else list(self.solution)
+
+    def edit(self, x, y, char):
+        """Changes one cell of the maze, requeues the cells whose distance
+        may have changed, and returns the repaired path (see path). Walling
+        off the start or the end leaves no path.
+
+        A cell that no search has reached, and that still cannot be
+        reached after the edit, changes no distances, so nothing is
+        searched (this is most edits once the start is walled in)."""
+        self.maze.set_cell(x, y, char)
+        grid = self.maze.grid
+        size = len(grid)
+        g = self.g
+        infinity = self.INFINITY
+        cell = self.maze.index((x, y))
+        if self.limit is not None and g[cell] == infinity and \
+                self.rhs[cell] == infinity and cell != self.start and \
+                (grid[cell] != OPEN or
+                 all(g[cell + step] == infinity for step in self.steps
+                     if 0 <= cell + step < size)):
+            self.expanded = 0
+            return None if self.solution is None else list(self.solution)
+        self.update(cell)
+        for step in self.steps:
+            if 0 <= cell + step < size:
+                self.update(cell + step)
+        return self.solve()
+
+    def set_wall(self, x, y):
+        """Turns a cell into a wall and returns the repaired path."""
+        return self.edit(x, y, "#")
+
+    def clear_wall(self, x, y):
+        """Turns a cell into a space and returns the repaired path."""
+        return self.edit(x, y, " ")
+
+
+def maze_paths(patterns):
+    """Expands maze file names, directories, and glob patterns into maze
+    file paths, one at a time, so that huge directories are never listed
+    into memory all at once.
+
+    Arguments:
+        patterns -- list -- File paths, directories (every .txt file in
+        the directory is used), or glob patterns such as "mazes/*.txt".
+
+    Yields:
+        str -- Each maze file path.
+    """
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            with os.scandir(pattern) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".txt"):
+                        yield entry.path
+        elif glob.has_magic(pattern):
+            yield from glob.iglob(pattern)
+        else:
+            yield pattern
+
+
+def solve_file(path, strategy="bfs", use_mmap=False):
+    """Loads and solves one maze file.
+
+    Arguments:
+        path -- str -- A path to a maze file.
+        strategy -- str -- The search to use (see Maze.solve).
+        use_mmap -- bool -- Whether to memory-map the file.
+
+    Returns:
+        dict -- Returns the path, the length of the solution, the number
+        of cells expanded, the time taken in seconds, and the solution as
+        a list of [x, y] pairs; the length and solution are None if the
+        maze has no path through it. If the maze could not be loaded or
+        solved, only the path and an error message.
+    """
+    began = time.perf_counter()
+    try:
+        maze = Maze(path, use_mmap)
+        try:
+            solution = maze.solve(strategy)
+        finally:
+            maze.close()
+    except Exception as e:
+        return {"path": path, "error": "{}: {}".format(type(e).__name__, e)}
+    if solution is None:
+        length = None
+    else:
+        length = len(solution)
+        solution = [list(c) for c in solution]
+    return {"path": path,
+            "length": length,
+            "expanded": maze.expanded,
+            "seconds": time.perf_counter() - began,
+            "solution": solution}
+
+
+def solve_many(paths, strategy="bfs", workers=None, use_mmap=False):
+    """Solves many mazes in parallel worker processes, yielding each
+    result as soon as it is ready. At most twice as many mazes as there
+    are workers are in progress at once, so memory use does not grow
+    with the number of paths.
+
+    Arguments:
+        paths -- iterable -- Paths to maze files.
+        strategy -- str -- The search to use (see Maze.solve).
+        workers -- int -- The number of worker processes; None means one
+        per CPU, and 1 means solve the mazes in this process.
+        use_mmap -- bool -- Whether to memory-map the files.
+
+    Yields:
+        dict -- The result of solve_file for each maze, in the order the
+        mazes are finished.
+    """
+    if workers == 1:
+        for path in paths:
+            yield solve_file(path, strategy, use_mmap)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for path in paths:
+            pending.add(executor.submit(solve_file, path, strategy,
+                                        use_mmap))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def main(args):
+    """Solves the mazes named on the command line and prints one JSON
+    object per maze (see solve_file) as each one is solved.
 
-def main(path):
-    my_maze = Maze(path)
-    Maze.solve(my_maze)
+    Arguments:
+        args -- list -- Command-line arguments: maze files, directories,
+        or glob patterns, optionally followed by --strategy, --workers,
+        --mmap, and --no-solution.
+    """
+    parser = argparse.ArgumentParser(description="Solve text mazes.")
+    parser.add_argument("paths", nargs="+",
+                        help="maze files, directories, or glob patterns")
+    parser.add_argument("--strategy", default="bfs", choices=STRATEGIES)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map the maze files")
+    parser.add_argument("--no-solution", action="store_true",
+                        help="leave the solutions out of the output")
+    options = parser.parse_args(args)
+    for result in solve_many(maze_paths(options.paths), options.strategy,
+                             options.workers, options.mmap):
+        if options.no_solution:
+            result.pop("solution", None)
+        print(json.dumps(result), flush=True)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,10 @@
 # replace solve_maze below with the name of your script minus the .py extension
-from hw4 import Maze
+import hw4
+from hw4 import Maze, IncrementalSolver, OPEN, STRATEGIES, solve_file
+from generate import KINDS, generate, write_maze
+import os
+import random
+import tempfile
 
 small_solution = [(0, 1), (1, 1), (2, 1), (3, 1), (4, 1), (5, 1), (5, 2),
                        (5, 3), (5, 4), (5, 5), (6, 5)]
@@ -9,6 +14,8 @@ assert small.start == small_solution[0], \
 assert small.end == small_solution[-1], \
     "unexpected ending coordinates for small maze"
 assert small.solve() == small_solution, "unexpected solution to small maze"
+assert small.solve_bfs() == small_solution, \
+    "unexpected breadth-first solution to small maze"
 
 medium_solution = [(0, 1), (1, 1), (2, 1), (3, 1), (3, 2), (3, 3), (2, 3),
                         (1, 3), (1, 4), (1, 5), (2, 5), (3, 5), (4, 5), (5, 5),
@@ -38,6 +45,8 @@ assert medium.end == medium_solution[-1], \
     "unexpected ending coordinates for medium maze"
 assert medium.solve() == medium_solution, \
     "unexpected solution to medium maze"
+assert medium.solve_bfs() == medium_solution, \
+    "unexpected breadth-first solution to medium maze"
 
 large_solution = [(0, 39), (1, 39), (1, 38), (1, 37), (2, 37), (3, 37), (3, 38),
                   (3, 39), (4, 39), (5, 39), (5, 38), (5, 37), (6, 37), (7, 37),
@@ -73,6 +82,153 @@ assert large.start == large_solution[0], \
 assert large.end == large_solution[-1], \
     "unexpected ending coordinates for large maze"
 assert large.solve() == large_solution, "unexpected solution to large maze"
+assert large.solve_bfs() == large_solution, \
+    "unexpected breadth-first solution to large maze"
+
+for strategy in ["bfs", "astar", "bidirectional", "dijkstra", "wavefront"]:
+    for name, maze, solution in [("small", small, small_solution),
+                                 ("medium", medium, medium_solution),
+                                 ("large", large, large_solution)]:
+        assert maze.solve(strategy) == solution, \
+            "unexpected {} solution to {} maze".format(strategy, name)
+        assert maze.expanded >= len(solution) // 2, \
+            "unexpected number of cells expanded by {}".format(strategy)
+
+for name, maze, solution in [("small", small, small_solution),
+                             ("medium", medium, medium_solution),
+                             ("large", large, large_solution)]:
+    assert maze.solve("corridors") == solution, \
+        "unexpected corridors solution to {} maze".format(name)
+    assert Maze(maze.path).compress() is maze.graph, \
+        "corridor graph of {} maze was not reused".format(name)
+    maze.solve_bfs()
+    bfs_expanded = maze.expanded
+    maze.solve_corridors()
+    assert maze.expanded <= bfs_expanded, \
+        "corridor graph of {} maze has too many nodes".format(name)
+
+hw4.GRAPH_CACHE.clear()
+hw4.GRAPH_CACHE_SIZE = 2
+small_graph = Maze("small_maze.txt").compress()
+Maze("medium_maze.txt").compress()
+Maze("large_maze.txt").compress()
+assert len(hw4.GRAPH_CACHE) == 2, "corridor graph cache is not bounded"
+assert Maze("small_maze.txt").compress() is not small_graph, \
+    "least recently used corridor graph was not evicted"
+hw4.GRAPH_CACHE_SIZE = 16
+
+for name, maze, solution in [("small", small, small_solution),
+                             ("medium", medium, medium_solution),
+                             ("large", large, large_solution)]:
+    field = maze.field(maze.start)
+    assert maze.route(maze.start, maze.end) == solution, \
+        "unexpected routed solution to {} maze".format(name)
+    assert maze.field(maze.start) is field, \
+        "distance field of {} maze was not reused".format(name)
+    assert field.distance(maze.end) == len(solution) - 1, \
+        "unexpected distance across {} maze".format(name)
+    assert maze.route(maze.end, maze.start) == solution[::-1], \
+        "unexpected reversed route through {} maze".format(name)
+    maze.field_budget = field.nbytes
+    maze.field(solution[1])
+    assert list(maze.fields) == [solution[1]], \
+        "distance fields of {} maze were not evicted".format(name)
+
+for name, path, solution in [("small", "small_maze.txt", small_solution),
+                             ("medium", "medium_maze.txt", medium_solution),
+                             ("large", "large_maze.txt", large_solution)]:
+    maze = Maze(path)
+    solver = IncrementalSolver(maze)
+    assert solver.solve() == solution, \
+        "unexpected incremental solution to {} maze".format(name)
+    x, y = solution[len(solution) // 2]
+    assert solver.set_wall(x, y) is None, \
+        "walled-off {} maze still has a path".format(name)
+    assert maze.solve_bfs() is None, \
+        "set_wall did not change {} maze".format(name)
+    assert solver.clear_wall(x, y) == solution, \
+        "unexpected repaired solution to {} maze".format(name)
+    # walling off either opening leaves no path until it is cleared
+    for opening in [solution[0], solution[-1]]:
+        assert solver.set_wall(*opening) is None, \
+            "{} maze has a path through a walled opening".format(name)
+        assert solver.clear_wall(*opening) == solution, \
+            "unexpected solution to {} maze with opening restored" \
+            .format(name)
+    # the edits and their undoing agree with a full search, whether the
+    # solver repairs its distances or falls back to searching again
+    random.seed(326)
+    for i in range(100):
+        x = random.randrange(1, maze.width - 1)
+        y = random.randrange(1, maze.height - 1)
+        if maze.grid[maze.index((x, y))] == OPEN:
+            repaired = solver.set_wall(x, y)
+        else:
+            repaired = solver.clear_wall(x, y)
+        solved = maze.solve_bfs()
+        assert (repaired is None) == (solved is None) and \
+            (solved is None or len(repaired) == len(solved)), \
+            "incremental solver disagrees on edited {} maze".format(name)
+
+with tempfile.TemporaryDirectory() as directory:
+    # the end is the last character of a row, even a short one
+    path = os.path.join(directory, "ragged.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#####\n    #\n### \n#####\n")
+    ragged = Maze(path)
+    assert ragged.end == (3, 2), "unexpected end of ragged maze"
+    assert ragged.solve_bfs() == [(0, 1), (1, 1), (2, 1), (3, 1), (3, 2)], \
+        "unexpected solution to ragged maze"
+
+with tempfile.TemporaryDirectory() as directory:
+    # the two loaders lay out a file with "\r\n" line endings differently,
+    # so they must not share a corridor graph
+    path = os.path.join(directory, "crlf.txt")
+    with open("small_maze.txt", encoding="utf-8") as f:
+        text = f.read()
+    with open(path, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write(text)
+    for use_mmap in [False, True]:
+        maze = Maze(path, use_mmap)
+        solution = maze.solve("bfs")
+        assert solution is not None and \
+            maze.solve("corridors") == solution, \
+            "unexpected corridors solution to CRLF maze (use_mmap={})" \
+            .format(use_mmap)
+
+with tempfile.TemporaryDirectory() as directory:
+    # a maze whose openings are not connected, and one without openings
+    for name, text in [("unsolvable", "#####\n  # \n#####\n"),
+                       ("closed", "#####\n#   #\n#####\n")]:
+        path = os.path.join(directory, name + ".txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        for strategy in STRATEGIES:
+            for use_mmap in [False, True]:
+                result = solve_file(path, strategy, use_mmap)
+                assert "error" not in result and \
+                    result["length"] is None and \
+                    result["solution"] is None, \
+                    "{} found a path through {} maze".format(strategy, name)
+
+assert generate(15, 10, "loops", seed=7) == generate(15, 10, "loops", seed=7), \
+    "generated mazes are not reproducible"
+with tempfile.TemporaryDirectory() as directory:
+    for kind in KINDS:
+        path = os.path.join(directory, kind + ".txt")
+        write_maze(path, 15, 10, kind, seed=7)
+        maze = Maze(path)
+        assert (maze.width, maze.height) == (31, 21), \
+            "unexpected size of generated {} maze".format(kind)
+        assert maze.start[0] == 0 and maze.end[0] == 30, \
+            "unexpected openings of generated {} maze".format(kind)
+        solution = maze.solve_bfs()
+        assert solution is not None, \
+            "generated {} maze has no solution".format(kind)
+        for strategy in ["astar", "bidirectional", "dijkstra", "corridors",
+                         "wavefront"]:
+            assert len(maze.solve(strategy)) == len(solution), \
+                "{} disagrees on generated {} maze".format(strategy, kind)
 
 # if we got this far, that means none of the code above raised an error
 print("Passed all tests")
@@ -1,8 +1,406 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
 import pandas as pd
 import sys
 
+try:
+    from pyarrow import feather
+except ImportError:
+    feather = None
+
+# the columns that mask() and analyze() need from the merged dataframe
+COLUMNS = ["Establishment_id", "Inspection_type", "Inspection_results",
+           "Name", "Distance_to_McKeldin", "location_1"]
+# McKeldin Library as (latitude, longitude), the default center on the
+# command line. For establishments.csv, Distance_to_McKeldin agrees with
+# haversine() from this point to within 0.05 miles, so main() uses that
+# column when the center is left at McKeldin.
+MCKELDIN = (38.986, -76.945)
+# the mean radius of the Earth in miles
+EARTH_RADIUS = 3958.8
+# where main() keeps the cached merged dataframe when --cache-dir is given
+# without a directory; nothing is cached unless it is asked for
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "hw6")
+# bumped whenever the cached dataframe would differ for the same CSV files
+CACHE_VERSION = 4
+
+# the dtype of each column of food_inspections.csv: text columns with few
+# distinct values become categoricals and the ID is a 32-bit integer that
+# can be missing (rows without one are read, but never counted). Columns not
+# listed here are read with the types pandas infers.
+VIOLATION_COLUMNS = ["Food_from_approved_source",
+                     "Food_protected_from_contamination",
+                     "Ill_workers_restricted", "Proper_hand_washing",
+                     "Cooling_time_and_temperature",
+                     "Cold_holding_temperature", "Hot_holding_temperature",
+                     "Cooking_time_and_temperature",
+                     "Reheating_time_and_temperature",
+                     "Hot_and_cold_running_water_provided",
+                     "Proper_sewage_disposal", "No_bare_hand_contact",
+                     "Adequate_hand_washing_facilities", "Rodent_and_insects",
+                     "Food_contact_surfaces_and_equipment"]
+INSPECTION_DTYPES = {"Establishment_id": "Int32",
+                     "Inspection_date": "category",
+                     "Inspection_results": "category",
+                     "Inspection_type": "category"}
+INSPECTION_DTYPES.update((name, "category") for name in VIOLATION_COLUMNS)
+# the dtype of each column of establishments.csv. Name and location_1 have
+# nearly one distinct value per row, so they stay strings; distances stay
+# float64 so that comparisons with a radius match the file exactly.
+ESTABLISHMENT_DTYPES = {"Establishment_id": "Int32",
+                        "Name": "str",
+                        "Category": "category",
+                        "City": "category",
+                        "State": "category",
+                        "Zip": "category",
+                        "Type": "category",
+                        "location_1": "str",
+                        "Distance_to_McKeldin": "float64"}
+# columns that nothing uses, skipped when the CSV files are read
+DROPPED_COLUMNS = {"Address_line_1", "Address_line_2", "Zip Codes"}
+
+
+def file_key(path, old_key=None):
+    """describes a file by its size, modification time and SHA-1 hash. The
+    hash is only recomputed when the size or modification time differs from
+    old_key, so checking an unchanged file does not read it.
+
+    Arguments:
+        path {str} -- file path to describe
+        old_key {dict} -- an earlier result of file_key for the same file, or
+        None
+
+    Returns:
+        dict -- the "size", "mtime_ns" and "sha1" of the file
+    """
+    stat = os.stat(path)
+    key = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if old_key is not None and old_key["size"] == key["size"] and \
+            old_key["mtime_ns"] == key["mtime_ns"]:
+        key["sha1"] = old_key["sha1"]
+        return key
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    key["sha1"] = digest.hexdigest()
+    return key
+
+
+def save_columns(df, directory):
+    """writes a dataframe to a directory, one column at a time: as a Feather
+    file if pyarrow is installed, otherwise as .npy files, with text columns
+    stored as integer codes plus an array of their distinct values (for a
+    categorical, its own codes and categories, so that the categories keep
+    their order) and
+    nullable numbers (such as "Int32") stored as values plus a mask of the
+    missing ones.
+
+    Without pyarrow, the text columns cost more than they save: Name and
+    location_1 have nearly one distinct value per row, so their arrays of
+    distinct values are about as large as the columns themselves, and
+    load_columns() turns them back into strings in memory.
+
+    Arguments:
+        df {dataframe} -- the dataframe to save
+        directory {str} -- an existing, empty directory
+
+    Returns:
+        dict -- how each column was stored, for load_columns()
+    """
+    if feather is not None:
+        feather.write_feather(df, os.path.join(directory, "merged.feather"))
+        return {"format": "feather"}
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = df[name]
+        entry = {"name": name, "dtype": str(column.dtype)}
+        if pd.api.types.is_extension_array_dtype(column) and \
+                pd.api.types.is_numeric_dtype(column):
+            np.save(os.path.join(directory, "{}.npy".format(i)),
+                    column.to_numpy(dtype=column.dtype.numpy_dtype,
+                                    na_value=0))
+            np.save(os.path.join(directory, "{}.mask.npy".format(i)),
+                    column.isna().to_numpy())
+            entry["kind"] = "nullable"
+        elif pd.api.types.is_numeric_dtype(column) or \
+                pd.api.types.is_bool_dtype(column):
+            np.save(os.path.join(directory, "{}.npy".format(i)),
+                    column.to_numpy())
+            entry["kind"] = "numeric"
+        else:
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy()
+                uniques = column.cat.categories
+                entry["ordered"] = bool(column.cat.ordered)
+            else:
+                codes, uniques = pd.factorize(column)
+            np.save(os.path.join(directory, "{}.npy".format(i)), codes)
+            np.save(os.path.join(directory, "{}.categories.npy".format(i)),
+                    np.array(uniques, dtype=str))
+            entry["kind"] = "text"
+        columns.append(entry)
+    return {"format": "npy", "columns": columns}
+
+
+def load_columns(directory, layout, columns=None):
+    """reads a dataframe written by save_columns(), memory-mapping the files
+    and reading only the requested columns. Only numeric columns stay
+    memory-mapped; text columns are read whole and every string is rebuilt
+    (see save_columns()).
+
+    Arguments:
+        directory {str} -- the directory passed to save_columns()
+        layout {dict} -- the result of save_columns()
+        columns {list} -- names of the columns to read, or None for all
+
+    Returns:
+        dataframe -- the saved dataframe (or the requested columns of it)
+    """
+    if layout["format"] == "feather":
+        table = feather.read_table(os.path.join(directory, "merged.feather"),
+                                   columns=columns, memory_map=True)
+        return table.to_pandas()
+    data = {}
+    entries = {entry["name"]: (i, entry)
+               for i, entry in enumerate(layout["columns"])}
+    names = columns if columns is not None else list(entries)
+    for name in names:
+        i, entry = entries[name]
+        values = np.load(os.path.join(directory, "{}.npy".format(i)),
+                         mmap_mode="r")
+        if entry["kind"] == "text":
+            categories = np.load(os.path.join(
+                directory, "{}.categories.npy".format(i)))
+            values = pd.Categorical.from_codes(
+                values, categories, ordered=entry.get("ordered", False))
+            if entry["dtype"] != "category":
+                values = values.astype(entry["dtype"])
+        elif entry["kind"] == "nullable":
+            values = pd.array(np.asarray(values), dtype=entry["dtype"])
+            values[np.load(os.path.join(
+                directory, "{}.mask.npy".format(i)))] = pd.NA
+        data[name] = values
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def parse_points(locations):
+    """parses "POINT (lon lat)" strings, such as the location_1 column of
+    establishments.csv, into arrays of coordinates.
+
+    Arguments:
+        locations {series} -- the strings to parse
+
+    Returns:
+        tuple -- arrays of the latitudes and the longitudes, with NaN where a
+        string is missing or malformed
+    """
+    points = locations.astype(object).str.extract(
+        r"POINT \(\s*(-?[\d.]+)\s+(-?[\d.]+)\s*\)")
+    lon = pd.to_numeric(points[0], errors="coerce").to_numpy(dtype=float)
+    lat = pd.to_numeric(points[1], errors="coerce").to_numpy(dtype=float)
+    return (lat, lon)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """computes great-circle distances between points; any argument can be
+    an array, in which case the distances are computed element by element.
+
+    Arguments:
+        lat1 {float} -- latitude of the first point, in degrees
+        lon1 {float} -- longitude of the first point, in degrees
+        lat2 {float} -- latitude of the second point, in degrees
+        lon2 {float} -- longitude of the second point, in degrees
+
+    Returns:
+        float -- the distance in miles
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class PointIndex():
+    def __init__(self, lat, lon, cell=0.01):
+        """buckets points into a grid of cell by cell degree squares so that
+        radius queries only compute distances to points in nearby squares.
+        Points whose coordinates are NaN are left out.
+
+        Arguments:
+            lat {array} -- latitudes of the points, in degrees
+            lon {array} -- longitudes of the points, in degrees
+            cell {float} -- size of a grid square, in degrees
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        self.cell = cell
+        found = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        self.lat0 = lat[found].min() if len(found) else 0.0
+        self.lon0 = lon[found].min() if len(found) else 0.0
+        rows = ((lat[found] - self.lat0) // cell).astype(np.int64)
+        cols = ((lon[found] - self.lon0) // cell).astype(np.int64)
+        self.rows = int(rows.max()) + 1 if len(found) else 0
+        self.cols = int(cols.max()) + 1 if len(found) else 0
+        keys = rows * self.cols + cols
+        order = np.argsort(keys, kind="stable")
+        # points sorted by grid square, row by row
+        self.keys = keys[order]
+        self.index = found[order]
+        self.lat = lat[self.index]
+        self.lon = lon[self.index]
+
+    def query(self, lat, lon, radius):
+        """finds the points within a distance of a center.
+
+        Arguments:
+            lat {float} -- latitude of the center, in degrees
+            lon {float} -- longitude of the center, in degrees
+            radius {float} -- distance in miles
+
+        Returns:
+            array -- positions (in the arrays given to the constructor) of the
+            points within radius miles of the center
+        """
+        if not self.rows:
+            return np.array([], dtype=np.int64)
+        dlat = np.degrees(radius / EARTH_RADIUS)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-12)
+        row0 = max(int((lat - dlat - self.lat0) // self.cell), 0)
+        row1 = min(int((lat + dlat - self.lat0) // self.cell), self.rows - 1)
+        col0 = max(int((lon - dlon - self.lon0) // self.cell), 0)
+        col1 = min(int((lon + dlon - self.lon0) // self.cell), self.cols - 1)
+        if row0 > row1 or col0 > col1:
+            return np.array([], dtype=np.int64)
+        rows = np.arange(row0, row1 + 1) * self.cols
+        starts = np.searchsorted(self.keys, rows + col0, side="left")
+        ends = np.searchsorted(self.keys, rows + col1, side="right")
+        candidates = np.concatenate([np.arange(start, end) for start, end
+                                     in zip(starts, ends)])
+        near = haversine(lat, lon, self.lat[candidates],
+                         self.lon[candidates]) <= radius
+        return self.index[candidates[near]]
+
+
+def read_csv(path, dtypes=None, **options):
+    """reads a CSV file, optionally with an explicit schema.
+
+    Arguments:
+        path {str} -- file path to the csv
+        dtypes {dict} -- if given, the dtype of each column; columns in
+        DROPPED_COLUMNS are then not read at all
+        options {dict} -- other keyword arguments for pd.read_csv()
+
+    Returns:
+        dataframe -- the contents of the file (or an iterator of chunks, if
+        options include chunksize)
+    """
+    if dtypes is not None:
+        options.setdefault("usecols",
+                           lambda name: name not in DROPPED_COLUMNS)
+        options["dtype"] = dtypes
+    return pd.read_csv(path, **options)
+
+
+def read_merged(path1, path2, schema=True):
+    """reads the two CSV files into dataframes and merges them on the
+    "Establishment_id" column using a left join with the inspection data as
+    the left dataframe.
+
+    Arguments:
+        path1 {str} -- file path to inspection csv
+        path2 {str} -- file path to establishments csv
+        schema {bool} -- if True, read the files with INSPECTION_DTYPES and
+        ESTABLISHMENT_DTYPES, leaving out DROPPED_COLUMNS; if False, let
+        pandas infer every column
+
+    Returns:
+        dataframe -- the merged dataframe
+    """
+    df1 = read_csv(path1, INSPECTION_DTYPES if schema else None)
+    df2 = read_csv(path2, ESTABLISHMENT_DTYPES if schema else None)
+    return pd.merge(df1, df2, how="left", on = "Establishment_id")
+
+
+def memory_report(path1, path2):
+    """prints the memory used by each column of the merged dataframe when
+    pandas infers the types and when the explicit schema is used.
+
+    Arguments:
+        path1 {str} -- file path to inspection csv
+        path2 {str} -- file path to establishments csv
+
+    Returns:
+        dataframe -- bytes used by each column "before" and "after", with a
+        "Total" row
+    """
+    before = read_merged(path1, path2, schema=False)\
+        .memory_usage(deep=True, index=False)
+    after = read_merged(path1, path2).memory_usage(deep=True, index=False)
+    report = pd.DataFrame({"before": before, "after": after})\
+        .fillna(0).astype(np.int64)
+    report.loc["Total"] = report.sum()
+    print(report.to_string())
+    print("Memory use fell by {:.1%}.".format(
+        1 - report.loc["Total", "after"] / report.loc["Total", "before"]))
+    return report
+
+
+def load_merged(path1, path2, cache_dir, columns=None):
+    """returns the merged dataframe of read_merged(), using a copy cached
+    in cache_dir when neither CSV file has changed since it was saved (see
+    file_key()) and rebuilding the cache otherwise.
+
+    Arguments:
+        path1 {str} -- file path to inspection csv
+        path2 {str} -- file path to establishments csv
+        cache_dir {str} -- directory that holds the cache; each pair of
+        CSV files gets its own subdirectory
+        columns {list} -- names of the columns to return, or None for all
+
+    Returns:
+        dataframe -- the merged dataframe (or the requested columns of it)
+    """
+    sources = [os.path.abspath(path1), os.path.abspath(path2)]
+    name = hashlib.sha1("\0".join(sources).encode("utf-8")).hexdigest()
+    directory = os.path.join(cache_dir, name[:16])
+    meta_path = os.path.join(directory, "meta.json")
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    if meta is not None and meta.get("version") == CACHE_VERSION and \
+            meta["sources"] == sources:
+        keys = [file_key(path, old) for path, old in
+                zip(sources, meta["keys"])]
+        if [key["sha1"] for key in keys] == \
+                [key["sha1"] for key in meta["keys"]]:
+            if keys != meta["keys"]:
+                # touched but unchanged: remember the new times
+                meta["keys"] = keys
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            return load_columns(directory, meta["layout"], columns)
+    keys = [file_key(path) for path in sources]
+    merged = read_merged(path1, path2)
+    # meta.json is written last, so a cache is only used once complete
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    layout = save_columns(merged, directory)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "sources": sources,
+                   "keys": keys, "layout": layout}, f)
+    if columns is not None:
+        merged = merged[columns]
+    return merged
+
+
 class FoodInspections():
-    def __init__(self, path1, path2):
+    def __init__(self, path1, path2, cache_dir=None, columns=None):
         """reads the two CSV files into dataframes and merges the two dataframes
         on the "Establishment_id" column using a left join with the inspection
         data as the left dataframe. Then stores the resulting merged dataframe
@@ -11,13 +409,46 @@ class FoodInspections():
         Arguments:
             path1 {str} -- a string representing the file path to a csv.
             path2 {str} -- a string representing the file path to a csv.
+            cache_dir {str} -- if given, a directory in which to cache the
+            merged dataframe between runs (see load_merged()).
+            columns {list} -- if given, keep only these columns (COLUMNS is
+            enough for analyze()).
+        """
+        if cache_dir is not None:
+            self.inspections = load_merged(path1, path2, cache_dir, columns)
+        else:
+            df3 = read_merged(path1, path2)
+            self.inspections = df3 if columns is None else df3[columns]
+        self.points = None
+        self.locations = None
+        self.critical = None
+        self.rankings = {}
+
+    def within(self, dist, center):
+        """finds the rows of the inspections dataframe whose establishment is
+        within a distance of any point, using the location_1 column of each
+        row (an Establishment_id on several rows of the establishments CSV
+        may have several locations). The distinct locations are parsed and
+        indexed the first time this is called.
+
+        Arguments:
+            dist {float} -- distance in miles from center
+            center {tuple} -- (latitude, longitude) of the center, in degrees
+
+        Returns:
+            array -- positions of the rows within dist miles of center, in
+            order
         """
-        df1 = pd.read_csv(path1)
-        df2 = pd.read_csv(path2)
-        df3 = pd.merge(df1, df2, how="left", on = "Establishment_id")
-        self.inspections = df3
+        if self.points is None:
+            self.locations, points = pd.factorize(
+                self.inspections["location_1"])
+            lat, lon = parse_points(pd.Series(points, dtype=object))
+            self.points = PointIndex(lat, lon)
+        found = self.points.query(center[0], center[1], float(dist))
+        # a row without a location has code -1, which is never found
+        return np.flatnonzero(np.isin(self.locations, found, kind="table"))
 
-    def analyze(self, dist):
+    def analyze(self, dist, center=None):
         """ calls the mask() method to get a dataframe with only the rows that
         meet the specified criteria. Finds out the maximum number of rows for a
         given Establishment ID in the masked dataframe and the maximum number of
@@ -28,23 +459,166 @@ class FoodInspections():
 
         Arguments:
             dist {float} -- distance in miles from McKeldin Library
+            center {tuple} -- if given, measure dist from this (latitude,
+            longitude) instead of McKeldin Library (see mask())
 
         Returns:
             Tuple -- a tuple consisting of the unique names, as a list, and the
-        number of violations that those establishments were given.
+        number of violations that those establishments were given (nan if
+        there were none).
 
         """
-        masked = self.mask(dist)
+        masked = self.mask(dist, center)
         id_counts = masked.groupby('Establishment_id')['Establishment_id'].\
         count()
-        max = id_counts.max()
+        # the max of an empty nullable count is <NA>; keep the baseline nan
+        max = id_counts.max() if len(id_counts) else np.nan
         most_violations_num = id_counts[id_counts == max]
         most_violations = masked[masked['Establishment_id'].isin\
             (most_violations_num.index)]
         lst = most_violations["Name"].unique()
         return (lst, max)
 
-    def mask(self, dist):
+    def ranking(self, center=None):
+        """applies the inspection type and result filters of mask() once,
+        counts the remaining rows of each establishment, and sorts the
+        establishments by distance, so that any radius can be answered
+        from the sorted arrays. The result is kept for each center.
+
+        An establishment is a row of the establishments CSV, not an ID: an
+        Establishment_id on several rows is merged with each of them, and
+        each row has its own name and distance. Rows that agree on all
+        three are counted together, since they are always within the same
+        radii.
+
+        Arguments:
+            center {tuple} -- (latitude, longitude) to measure distances from,
+            or None to use the Distance_to_McKeldin column
+
+        Returns:
+            dict -- arrays in order of distance: "distance" (NaN if unknown),
+            "count" (rows per establishment), "first" (position of the
+            establishment's first row in the filtered dataframe), "id" (the
+            position of its Establishment_id among the distinct IDs), and
+            "name" (a series of establishment names)
+        """
+        if center in self.rankings:
+            return self.rankings[center]
+        df = self.inspections
+        violations = df[df["Inspection_type"].isin(["Monitoring",
+                                                    "Comprehensive"]) &
+                        (df["Inspection_results"] ==
+                         "Critical Violations observed") &
+                        df["Establishment_id"].notna()]
+        if center is None:
+            distance = violations["Distance_to_McKeldin"].to_numpy(
+                dtype=float)
+        else:
+            locations, points = pd.factorize(violations["location_1"])
+            lat, lon = parse_points(pd.Series(points, dtype=object))
+            # a missing location has code -1, which picks the NaN at the end
+            distance = np.append(haversine(center[0], center[1], lat, lon),
+                                 np.nan)[locations]
+        ids = violations["Establishment_id"].to_numpy()
+        names = violations["Name"].reset_index(drop=True)
+        groups = pd.DataFrame({"id": ids, "name": names,
+                               "distance": distance}).groupby(
+            ["id", "name", "distance"], sort=False, dropna=False).ngroup()
+        _, first, count = np.unique(
+            groups.to_numpy(), return_index=True, return_counts=True)
+        id_codes = pd.factorize(ids)[0]
+        order = np.argsort(distance[first], kind="stable")
+        first = first[order]
+        ranking = {"distance": distance[first],
+                   "count": count[order],
+                   "first": first,
+                   "id": id_codes[first],
+                   "name": names.iloc[first].reset_index(drop=True)}
+        self.rankings[center] = ranking
+        return ranking
+
+    @staticmethod
+    def leaders(ranking, n, ids):
+        """returns the names of the establishments among the first n of a
+        ranking whose Establishment_id is in ids, in the order in which they
+        appear in the merged dataframe, as analyze() returns them.
+
+        Arguments:
+            ranking {dict} -- the result of ranking()
+            n {int} -- the number of establishments within the radius
+            ids {array} -- positions of Establishment_ids (see ranking())
+
+        Returns:
+            array -- the distinct names
+        """
+        rows = np.flatnonzero(np.isin(ranking["id"][:n], ids))
+        rows = rows[np.argsort(ranking["first"][rows], kind="stable")]
+        return ranking["name"].iloc[rows].unique()
+
+    def analyze_sorted(self, dist, center=None):
+        """returns the same result as analyze(), but finds the establishments
+        within dist with a binary search of ranking() instead of masking the
+        whole dataframe.
+
+        Arguments:
+            dist {float} -- distance in miles from McKeldin Library (or from
+            center)
+            center {tuple} -- if given, measure dist from this (latitude,
+            longitude)
+
+        Returns:
+            Tuple -- a tuple consisting of the unique names, as a list, and the
+        number of violations that those establishments were given.
+        """
+        ranking = self.ranking(center)
+        n = np.searchsorted(ranking["distance"], float(dist), side="right")
+        if n == 0:
+            return (ranking["name"].iloc[:0].unique(), np.nan)
+        # the violations of each Establishment_id, over all of its rows
+        counts = np.bincount(ranking["id"][:n], weights=ranking["count"][:n])
+        max = counts.max()
+        ids = np.flatnonzero(counts == max)
+        return (self.leaders(ranking, n, ids), np.int64(max))
+
+    def analyze_many(self, radii, center=None):
+        """answers analyze() for a list of distances in one pass: the
+        distances are visited from smallest to largest while establishments
+        from ranking() are added in order of distance, keeping each
+        Establishment_id's number of violations, the current maximum, and
+        the IDs that have it.
+
+        Arguments:
+            radii {list} -- distances in miles from McKeldin Library (or from
+            center), in any order
+            center {tuple} -- if given, measure distances from this (latitude,
+            longitude)
+
+        Returns:
+            list -- the result of analyze() for each distance in radii
+        """
+        ranking = self.ranking(center)
+        distance, count, ids = ranking["distance"], ranking["count"], \
+            ranking["id"]
+        counts = np.zeros(ids.max() + 1 if len(ids) else 0, dtype=np.int64)
+        results = [None] * len(radii)
+        k = 0
+        max = np.nan
+        leaders = set()
+        for i in sorted(range(len(radii)), key=lambda i: float(radii[i])):
+            radius = float(radii[i])
+            while k < len(distance) and distance[k] <= radius:
+                counts[ids[k]] += count[k]
+                # max starts as NaN, which every comparison treats as unequal
+                if not counts[ids[k]] < max:
+                    if not counts[ids[k]] == max:
+                        leaders = set()
+                    max = counts[ids[k]]
+                    leaders.add(ids[k])
+                k += 1
+            results[i] = (self.leaders(ranking, k, list(leaders)), max)
+        return results
+
+    def mask(self, dist, center=None):
         """Applies a mask to the inspections dataframe filtering the data in
         the following ways: establishments that are within the distance
         specified in the 'dist' argument, the value of the "Inspection_type"
@@ -54,20 +628,122 @@ class FoodInspections():
 
         Arguments:
             dist {float} -- distance in miles from McKeldin Library
+            center {tuple} -- if given, keep establishments within dist miles
+            of this (latitude, longitude) instead, going by their location_1
+            column (see within()). The inspection type and result filters
+            are then applied to the rows within() finds, from an array of
+            the rows that pass them that is made on the first such call.
 
         Returns:
             dataframe -- a masked dataframe filtered using the specification
             listed in the description above.
         """
-        within_dist = self.inspections[(self.inspections['Distance_to_McKeldin'\
-                                                         ] <= float(dist))]
+        if center is not None:
+            if self.critical is None:
+                df = self.inspections
+                self.critical = (df["Inspection_type"].isin(
+                    ["Monitoring", "Comprehensive"]) &
+                    (df["Inspection_results"] ==
+                     "Critical Violations observed")).to_numpy()
+            rows = self.within(dist, center)
+            return self.inspections.iloc[rows[self.critical[rows]]]
+        else:
+            within_dist = self.inspections[(self.inspections[
+                'Distance_to_McKeldin'] <= float(dist))]
         insp_type = within_dist[within_dist["Inspection_type"].isin(\
             ["Monitoring", "Comprehensive"])]
         masked_df = insp_type[(insp_type["Inspection_results"] ==\
                                  "Critical Violations observed")]
         return masked_df
 
-def main(path_to_inspection, path_to_establishments, dist):
+class StreamingInspections():
+    def __init__(self, path1, path2, chunksize=100000):
+        """reads the establishments CSV into a lookup table, but leaves the
+        inspections CSV on disk: analyze() reads it a chunk at a time, so
+        memory use does not grow with the number of inspections. An
+        Establishment_id may appear on more than one row of the table, as
+        it may in the merge of FoodInspections; ids holds each distinct ID
+        once and row_ids the position in ids of each row's ID.
+
+        Arguments:
+            path1 {str} -- file path to inspection csv
+            path2 {str} -- file path to establishments csv
+            chunksize {int} -- number of inspection rows to read at a time
+        """
+        self.path = path1
+        self.chunksize = chunksize
+        self.establishments = read_csv(path2, ESTABLISHMENT_DTYPES).dropna(
+            subset=["Establishment_id"]).reset_index(drop=True)
+        self.row_ids, ids = pd.factorize(
+            self.establishments["Establishment_id"])
+        self.ids = pd.Index(ids)
+
+    def distances(self, center=None):
+        """returns the distance of each establishment in the lookup table, in
+        miles, from center or (if center is None) from McKeldin Library."""
+        if center is None:
+            return self.establishments["Distance_to_McKeldin"].to_numpy(
+                dtype=float)
+        lat, lon = parse_points(self.establishments["location_1"])
+        return haversine(center[0], center[1], lat, lon)
+
+    def analyze(self, dist, center=None):
+        """returns the same result as FoodInspections.analyze(), reading the
+        inspections in chunks. Each chunk is filtered with the predicates of
+        FoodInspections.mask(), and only a violation count and the position
+        of the first violation row are kept per establishment ID.
+
+        Like the left join of FoodInspections, an ID on several rows of the
+        establishments CSV counts each of its inspections once per row
+        within dist, and every one of those rows contributes its name.
+
+        Arguments:
+            dist {float} -- distance in miles from McKeldin Library
+            center {tuple} -- if given, measure dist from this (latitude,
+            longitude) instead of McKeldin Library
+
+        Returns:
+            Tuple -- a tuple consisting of the unique names, as a list, and the
+        number of violations that those establishments were given.
+        """
+        near_rows = self.distances(center) <= float(dist)
+        ids = self.ids
+        # the number of rows within dist of each ID
+        near = np.bincount(self.row_ids[near_rows], minlength=len(ids))
+        counts = np.zeros(len(ids), dtype=np.int64)
+        first = np.full(len(ids), np.iinfo(np.int64).max)
+        row = 0
+        chunks = read_csv(self.path, INSPECTION_DTYPES,
+                          chunksize=self.chunksize,
+                          usecols=["Establishment_id", "Inspection_type",
+                                   "Inspection_results"])
+        for chunk in chunks:
+            positions = ids.get_indexer(chunk["Establishment_id"])
+            keep = (positions >= 0) & \
+                chunk["Inspection_type"].isin(["Monitoring",
+                                               "Comprehensive"]).to_numpy() & \
+                (chunk["Inspection_results"] ==
+                 "Critical Violations observed").to_numpy()
+            keep[keep] = near[positions[keep]] > 0
+            positions = positions[keep]
+            counts += np.bincount(positions, minlength=len(ids))
+            np.minimum.at(first, positions,
+                          row + np.flatnonzero(keep))
+            row += len(chunk)
+        counts *= near
+        if not counts.any():
+            return (self.establishments["Name"].iloc[:0].unique(), np.nan)
+        max = counts.max()
+        # the rows of the leading IDs, in the order of the merged dataframe:
+        # by first violation, then by position in the establishments CSV
+        leaders = np.flatnonzero(near_rows & (counts[self.row_ids] == max))
+        leaders = leaders[np.argsort(first[self.row_ids[leaders]],
+                                     kind="stable")]
+        return (self.establishments["Name"].iloc[leaders].unique(), max)
+
+
+def main(path_to_inspection, path_to_establishments, dist, lat=None,
+         lon=None, cache_dir=None):
     """main function that instantiates a FoodInspection object and runs methods
     on the dataframe.
 
@@ -75,11 +751,67 @@ def main(path_to_inspection, path_to_establishments, dist):
         path_to_inspection {str} -- file path to inspection csv
         path_to_establishments {str} -- file path to establishments csv
         dist {float} -- distance in miles from McKeldin Library
+        lat {float} -- if given, measure dist from this latitude (the
+        longitude defaults to McKeldin Library's)
+        lon {float} -- if given, measure dist from this longitude (the
+        latitude defaults to McKeldin Library's)
+        cache_dir {str} -- if given, a directory in which to cache the
+        merged dataframe between runs (see load_merged())
     """
-    my_inspections = FoodInspections(path_to_inspection, path_to_establishments)
-    violations = my_inspections.analyze(dist)
+    my_inspections = FoodInspections(path_to_inspection,
+                                     path_to_establishments, cache_dir,
+                                     COLUMNS)
+    center = (MCKELDIN[0] if lat is None else float(lat),
+              MCKELDIN[1] if lon is None else float(lon))
+    if center == MCKELDIN:
+        center = None
+    violations = my_inspections.analyze(dist, center)
     print("The establishments with the most violations were: " + \
         str(violations[0]) + " with " + str(violations[1]) + " violations.")
 
+def parse_args(args):
+    """parses the command line arguments of the script.
+
+    Arguments:
+        args {list} -- the arguments, without the name of the script
+
+    Returns:
+        namespace -- path_to_inspection, path_to_establishments, dist, lat,
+        lon, cache_dir and memory
+    """
+    parser = argparse.ArgumentParser(
+        description="Find the establishments with the most critical "
+        "violations near McKeldin Library.")
+    parser.add_argument("path_to_inspection",
+                        help="file path to inspection csv")
+    parser.add_argument("path_to_establishments",
+                        help="file path to establishments csv")
+    parser.add_argument("dist", type=float, nargs="?",
+                        help="distance in miles from McKeldin Library")
+    parser.add_argument("--lat", type=float, default=MCKELDIN[0],
+                        help="latitude to measure dist from (default: "
+                        "%(default)s, McKeldin Library)")
+    parser.add_argument("--lon", type=float, default=MCKELDIN[1],
+                        help="longitude to measure dist from (default: "
+                        "%(default)s, McKeldin Library)")
+    parser.add_argument("--cache-dir", nargs="?", const=CACHE_DIR,
+                        help="cache the merged data in this directory "
+                        "(default: {}) to load it faster next time; with "
+                        "pyarrow installed the cache is a Feather file, "
+                        "otherwise it is slower to build than reading the "
+                        "CSV files".format(CACHE_DIR))
+    parser.add_argument("--memory", action="store_true",
+                        help="print the memory used by each column instead")
+    options = parser.parse_args(args)
+    if options.dist is None and not options.memory:
+        parser.error("dist is required unless --memory is given")
+    return options
+
 if __name__ == '__main__':
-    main(sys.argv[1], sys.argv[2], sys.argv[3])
+    options = parse_args(sys.argv[1:])
+    if options.memory:
+        memory_report(options.path_to_inspection,
+                      options.path_to_establishments)
+    else:
+        main(options.path_to_inspection, options.path_to_establishments,
+             options.dist, options.lat, options.lon, options.cache_dir)
@@ -0,0 +1,159 @@
+import contextlib
+import csv
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import hw6
+
+# the radii and centers that the analyze methods are compared on
+RADII = [0.1, 0.5, 1, 2, 5, 50]
+CENTERS = [None, (38.99, -76.93), (38.9, -76.8)]
+
+
+def write_inspections(path, ids, rows=3000, seed=326):
+    """ write a random inspections CSV for the given establishment IDs,
+    some rows of which have no ID """
+    rng = random.Random(seed)
+    ids = list(ids) + [""]
+    results = ["Critical Violations observed", "Compliant - No Health Risk",
+               "Non-Compliant - Violations Observed"]
+    types = ["Monitoring", "Comprehensive", "Re-inspection", "Complaint"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Establishment_id", "Inspection_date",
+                         "Inspection_results"] + hw6.VIOLATION_COLUMNS +
+                        ["Inspection_type"])
+        for i in range(rows):
+            writer.writerow([rng.choice(ids), "03/21/2019 12:00:00 AM",
+                             rng.choice(results)] +
+                            ["In Compliance"] * len(hw6.VIOLATION_COLUMNS) +
+                            [rng.choice(types)])
+
+
+class TestAnalyze(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """write an inspections CSV and an establishments CSV in which some
+        IDs are on more than one row, with other names and locations"""
+        cls.directory = tempfile.TemporaryDirectory()
+        establishments = pd.read_csv("establishments.csv")
+        near = establishments.sort_values("Distance_to_McKeldin").iloc[:200]
+        cls.inspections = os.path.join(cls.directory.name, "inspections.csv")
+        write_inspections(cls.inspections, near["Establishment_id"])
+        dup = near.iloc[[0, 5, 10, 50]].copy()
+        dup["Name"] = ["DUP_A", "DUP_B", "DUP_C", "DUP_D"]
+        # one copy in the same place, the others where other establishments
+        # are
+        dup.iloc[1:, dup.columns.get_loc("location_1")] = \
+            near["location_1"].iloc[[100, 150, 199]].to_numpy()
+        dup.iloc[1:, dup.columns.get_loc("Distance_to_McKeldin")] = \
+            near["Distance_to_McKeldin"].iloc[[100, 150, 199]].to_numpy()
+        cls.establishments = os.path.join(cls.directory.name,
+                                          "establishments.csv")
+        pd.concat([establishments, dup]).to_csv(cls.establishments,
+                                                index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def assertSameResult(self, result, expected, message):
+        """ check that two results of analyze() name the same establishments
+        in the same order and agree on the number of violations """
+        self.assertEqual(list(result[0]), list(expected[0]), message)
+        if pd.isna(expected[1]):
+            self.assertTrue(pd.isna(result[1]), message)
+        else:
+            self.assertEqual(result[1], expected[1], message)
+
+    def test_within(self):
+        """ within() finds the rows whose own location is within a distance,
+        so analyze() agrees with StreamingInspections when an ID is on
+        several rows of the establishments CSV """
+        inspections = hw6.FoodInspections(self.inspections,
+                                          self.establishments)
+        streaming = hw6.StreamingInspections(self.inspections,
+                                             self.establishments,
+                                             chunksize=1000)
+        lat, lon = hw6.parse_points(inspections.inspections["location_1"])
+        for center in CENTERS[1:]:
+            distance = hw6.haversine(center[0], center[1], lat, lon)
+            for radius in RADII:
+                message = "center {}, radius {}".format(center, radius)
+                self.assertEqual(list(inspections.within(radius, center)),
+                                 list(np.flatnonzero(distance <= radius)),
+                                 message)
+                self.assertSameResult(inspections.analyze(radius, center),
+                                      streaming.analyze(radius, center),
+                                      message)
+
+    def test_duplicated_ids(self):
+        """ analyze_sorted() and analyze_many() agree with analyze() when an
+        ID is on several rows of the establishments CSV """
+        inspections = hw6.FoodInspections(self.inspections,
+                                          self.establishments)
+        for center in CENTERS:
+            many = inspections.analyze_many(RADII, center)
+            for radius, result in zip(RADII, many):
+                expected = inspections.analyze(radius, center)
+                message = "center {}, radius {}".format(center, radius)
+                self.assertSameResult(
+                    inspections.analyze_sorted(radius, center), expected,
+                    message)
+                self.assertSameResult(result, expected, message)
+
+    def test_no_violations(self):
+        """ every analyze method gives nan for the number of violations
+        when no establishment is within the distance, as main() prints """
+        inspections = hw6.FoodInspections(self.inspections,
+                                          self.establishments)
+        streaming = hw6.StreamingInspections(self.inspections,
+                                             self.establishments)
+        for center in CENTERS:
+            results = [inspections.analyze(0, center),
+                       inspections.analyze_sorted(0, center),
+                       inspections.analyze_many([0], center)[0],
+                       streaming.analyze(0, center)]
+            for names, count in results:
+                self.assertEqual(len(names), 0)
+                self.assertIs(count, np.nan)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            hw6.main(self.inspections, self.establishments, 0)
+        self.assertIn(" with nan violations.", output.getvalue())
+
+class TestCache(unittest.TestCase):
+
+    def test_round_trip(self):
+        """ load_columns() gives back exactly the dataframe that
+        save_columns() wrote, categories and missing IDs included, and
+        load_merged() reuses it """
+        with tempfile.TemporaryDirectory() as directory:
+            inspections = os.path.join(directory, "inspections.csv")
+            write_inspections(inspections, range(1, 400))
+            merged = hw6.read_merged(inspections, "establishments.csv")
+            self.assertTrue(merged["Establishment_id"].isna().any())
+            saved = os.path.join(directory, "saved")
+            os.makedirs(saved)
+            layout = hw6.save_columns(merged, saved)
+            pd.testing.assert_frame_equal(hw6.load_columns(saved, layout),
+                                          merged)
+            pd.testing.assert_frame_equal(
+                hw6.load_columns(saved, layout, hw6.COLUMNS),
+                merged[hw6.COLUMNS])
+            cache = os.path.join(directory, "cache")
+            for i in range(2):
+                pd.testing.assert_frame_equal(
+                    hw6.load_merged(inspections, "establishments.csv",
+                                    cache), merged)
+
+
+if __name__ == "__main__":
+    unittest.main()